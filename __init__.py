@@ -1,20 +1,40 @@
 import importlib
+import logging
 import os
 import pkgutil
+import time
 
 # 动态加载 node 目录下所有节点模块
+# 各模块的重量级依赖（torch、cv2、qiniu、openai 等）均在节点首次执行时才导入，
+# 单个模块导入失败只跳过该模块，不影响其它节点注册
 NODE_CLASS_MAPPINGS = {}
 NODE_DISPLAY_NAME_MAPPINGS = {}
+WEB_DIRECTORY = "./js"
+
+logger = logging.getLogger("ComfyUI-LLM")
 
 package = __name__
 node_pkg = f"{package}.node"
 
+_import_times = []
 for _, modname, ispkg in pkgutil.iter_modules([os.path.join(os.path.dirname(__file__), 'node')]):
     if not ispkg:
-        module = importlib.import_module(f"{node_pkg}.{modname}")
+        start = time.perf_counter()
+        try:
+            module = importlib.import_module(f"{node_pkg}.{modname}")
+        except Exception as e:
+            logger.warning(f"节点模块 {modname} 加载失败，已跳过: {str(e)}")
+            continue
+        finally:
+            _import_times.append((modname, time.perf_counter() - start))
         if hasattr(module, "NODE_CLASS_MAPPINGS"):
             NODE_CLASS_MAPPINGS.update(getattr(module, "NODE_CLASS_MAPPINGS"))
         if hasattr(module, "NODE_DISPLAY_NAME_MAPPINGS"):
             NODE_DISPLAY_NAME_MAPPINGS.update(getattr(module, "NODE_DISPLAY_NAME_MAPPINGS"))
 
-__all__ = ["NODE_CLASS_MAPPINGS", "NODE_DISPLAY_NAME_MAPPINGS"]
\ No newline at end of file
+# 启动耗时报告（更细的依赖级耗时可用 python -X importtime main.py 查看）
+logger.info(
+    "节点模块导入耗时: " + ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in sorted(_import_times, key=lambda x: -x[1]))
+)
+
+__all__ = ["NODE_CLASS_MAPPINGS", "NODE_DISPLAY_NAME_MAPPINGS", "WEB_DIRECTORY"]
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+基准测试脚本共用工具：不经过插件 __init__（避免加载全部节点、启动后台线程），
+直接以包的形式导入仓库内的模块，使相对导入（from ..cloud_utils import ...）可用。
+"""
+import os
+import sys
+import time
+import types
+import importlib
+import resource
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "comfyui_llm_bench"
+
+
+def load(module: str):
+    """导入仓库内模块，如 load("node.cloud_node")"""
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [REPO_DIR]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{module}")
+
+
+def timed(fn, *args, repeat: int = 1, **kwargs):
+    """运行 repeat 次，返回 (最短耗时秒数, 最后一次结果)"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_rss_mb() -> float:
+    """当前进程峰值常驻内存（MB，Linux 下 ru_maxrss 单位为 KB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def make_sample_video(path: str, seconds: int = 10, size: str = "1280x720", fps: int = 30, audio: bool = True) -> str:
+    """用 ffmpeg 测试源生成示例视频（带正弦波音轨），已存在时直接复用"""
+    import subprocess
+    import imageio_ffmpeg
+    if os.path.exists(path):
+        return path
+    cmd = [imageio_ffmpeg.get_ffmpeg_exe(), '-v', 'error', '-y',
+           '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate={fps}:duration={seconds}']
+    if audio:
+        cmd += ['-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}', '-c:a', 'aac']
+    cmd += ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-g', str(fps * 2), path]
+    subprocess.run(cmd, check=True)
+    return path
+
+
+def load_sample_frames(count: int):
+    """从 720p 示例视频读取前 count 帧，返回 (N, H, W, 3) 的 uint8 RGB 数组"""
+    import cv2
+    import tempfile
+    import numpy as np
+    video = make_sample_video(os.path.join(tempfile.gettempdir(), "comfyui_llm_bench_720p.mp4"))
+    cap = cv2.VideoCapture(video)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    cap.release()
+    return np.stack(frames)
+
+
+def print_table(headers: list, rows: list):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(row, widths)))
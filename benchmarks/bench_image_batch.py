@@ -0,0 +1,71 @@
+"""
+循环追加图片：IMAGE_BUFFER（容量倍增 / 预分配）与旧版 torch.cat 逐次拼接 → 总耗时、ms/次、峰值内存
+
+用法: python benchmarks/bench_image_batch.py [--appends 500] [--size 1024] [--paths buffer,buffer_capacity,cat]
+每种实现在独立子进程中运行，峰值 RSS 互不影响。
+注意 500 帧 1024x1024 的 float32 结果本身约 6GB（倍增扩容时峰值约 9GB），
+torch.cat 路径累计拷贝量约 1.5TB，内存或时间不足时可减小 --size / --appends，或只测 buffer 路径。
+"""
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+from _common import load, peak_rss_mb, print_table
+
+
+def run_child(path: str, appends: int, size: int):
+    import torch
+    vs = load("node.video_split_node")
+    frame = torch.rand(1, size, size, 3)
+    base = peak_rss_mb()
+
+    start = time.perf_counter()
+    if path == "cat":
+        append = vs.AppendImagesToBatch().append
+        (batch,) = vs.CreateEmptyImageBatch().create()
+        for _ in range(appends):
+            (batch,) = append(batch, frame)
+    else:
+        capacity = appends if path == "buffer_capacity" else 0
+        append = vs.AppendImagesToBuffer().append
+        (buffer,) = vs.CreateImageBatchBuffer().create(frame, capacity)
+        for _ in range(appends - 1):
+            (buffer,) = append(buffer, frame)
+        batch, _ = vs.FinalizeImageBatchBuffer().finalize(buffer)
+    seconds = time.perf_counter() - start
+    assert batch.shape[0] == appends
+    print(json.dumps({"seconds": seconds, "base_rss": base, "peak_rss": peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--appends", type=int, default=500)
+    parser.add_argument("--size", type=int, default=1024, help="图片边长（像素）")
+    parser.add_argument("--paths", default="buffer,buffer_capacity,cat")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.appends, args.size)
+        return
+
+    print(f"追加 {args.appends} 次，每次 1 张 {args.size}x{args.size}，结果 {args.appends * args.size * args.size * 12 / 1024 / 1024:.0f}MB")
+    rows = []
+    for path in args.paths.split(","):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", path, "--appends", str(args.appends), "--size", str(args.size)],
+            stdout=subprocess.PIPE, text=True,
+        )
+        if proc.returncode != 0:
+            rows.append([path, "-", "-", f"失败（退出码 {proc.returncode}）"])
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        rows.append([path, f"{result['seconds']:.2f}", f"{result['seconds'] * 1000 / args.appends:.2f}",
+                     f"{result['peak_rss'] - result['base_rss']:.0f}"])
+    print_table(["实现", "耗时(s)", "ms/次", "峰值增量(MB)"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+图片编码：各格式/参数下每帧字节数与毫秒数，以及编码进程数对吞吐的影响
+
+用法: python benchmarks/bench_image_encode.py [--frames 16] [--workers 1,2,4]
+测试帧取自 ffmpeg 测试源生成的 1280x720 示例视频。
+"""
+import os
+import time
+import argparse
+
+from _common import load, load_sample_frames, print_table
+
+CASES = [
+    ("PNG", "默认 compress_level=6", {"png_compress_level": 6}),
+    ("PNG", "compress_level=1", {"png_compress_level": 1}),
+    ("PNG", "compress_level=9", {"png_compress_level": 9}),
+    ("PNG", "optimize", {"png_optimize": True}),
+    ("JPEG", "默认 quality=75", {}),
+    ("JPEG", "quality=90 4:4:4", {"jpeg_quality": 90, "jpeg_subsampling": "4:4:4"}),
+    ("JPEG", "quality=90 progressive", {"jpeg_quality": 90, "jpeg_progressive": True}),
+    ("WEBP", "默认 quality=80 method=4", {}),
+    ("WEBP", "method=0", {"webp_method": 0}),
+    ("WEBP", "lossless method=0", {"webp_lossless": True, "webp_method": 0}),
+    ("GIF", "自适应调色板", {}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=16)
+    parser.add_argument("--workers", default="1,2,4")
+    args = parser.parse_args()
+
+    cn = load("node.cloud_node")
+    frames = load_sample_frames(args.frames)
+    print(f"{len(frames)} 帧 {frames.shape[2]}x{frames.shape[1]}，CPU 核数 {os.cpu_count()}")
+
+    rows = []
+    for format, label, kwargs in CASES:
+        options = cn._image_save_options(format, **kwargs)
+        start = time.perf_counter()
+        sizes = [len(cn._encode_image(frame, format, options)) for frame in frames]
+        ms = (time.perf_counter() - start) * 1000 / len(frames)
+        rows.append([format, label, f"{sum(sizes) / len(sizes) / 1024:.0f}", f"{ms:.1f}"])
+    print_table(["格式", "参数", "KB/帧", "ms/帧"], rows)
+
+    print()
+    rows = []
+    options = cn._image_save_options("PNG")
+    for workers in (int(w) for w in args.workers.split(",")):
+        pool = cn._get_encode_pool(workers)
+        start = time.perf_counter()
+        if pool is None:
+            for frame in frames:
+                cn._encode_image(frame, "PNG", options)
+        else:
+            list(pool.map(cn._encode_image, frames, ["PNG"] * len(frames), [options] * len(frames)))
+        seconds = time.perf_counter() - start
+        rows.append([workers, f"{seconds * 1000 / len(frames):.1f}", f"{len(frames) / seconds:.1f}"])
+    print_table(["编码进程数", "ms/帧", "帧/秒"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+图片批量上传：本地假七牛表单上传服务器（固定往返延迟）下，上传并发数 → 张/秒
+
+用法: python benchmarks/bench_image_upload.py [--images 64] [--size 512] [--rtt 0.05] [--concurrency 1,2,4,8]
+七牛 SDK 的上传域名指向本地服务器，走 CloudImageUploadNode.upload_images 的完整流程（编码 + put_data）。
+"""
+import io
+import re
+import json
+import time
+import argparse
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from _common import load, print_table
+
+
+class FakeQiniuForm(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, rtt: float):
+        super().__init__(("127.0.0.1", 0), FakeQiniuFormHandler)
+        self.rtt = rtt
+        self.received = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FakeQiniuFormHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(self.server.rtt)
+        with self.server.lock:
+            self.server.received += len(body)
+        key = re.search(rb'name="key"\r\n\r\n([^\r]*)', body)
+        data = json.dumps({"key": key.group(1).decode() if key else "", "hash": ""}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--size", type=int, default=512, help="图片边长（像素）")
+    parser.add_argument("--format", default="JPEG")
+    parser.add_argument("--rtt", type=float, default=0.05, help="服务器每次上传的模拟往返延迟（秒）")
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    args = parser.parse_args()
+
+    import numpy as np
+    from qiniu import config, Region
+
+    server = FakeQiniuForm(args.rtt)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config.set_default(default_zone=Region(up_host=server.url))
+
+    cn = load("node.cloud_node")
+    # 固定使用七牛后端，不受本机 cloud_config.json 影响
+    cn.load_cloud_config = lambda: ("qiniu", {})
+    node = cn.CloudImageUploadNode()
+    rng = np.random.default_rng(0)
+    images = rng.random((args.images, args.size, args.size, 3), dtype=np.float32)
+    print(f"{args.images} 张 {args.size}x{args.size} {args.format}，往返延迟 {args.rtt * 1000:.0f}ms，服务器 {server.url}")
+
+    rows = []
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        server.received = 0
+        start = time.perf_counter()
+        # 节点逐张打印上传结果，测量时丢弃
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, errors = node.upload_images("ak", "sk", "bucket", "cdn.example.com", images, "bench", "", args.format,
+                                           concurrency=concurrency)
+        seconds = time.perf_counter() - start
+        failed = sum(1 for e in errors if e)
+        rows.append([concurrency, f"{seconds:.2f}", f"{args.images / seconds:.1f}",
+                     f"{server.received / seconds / 1024 / 1024:.1f}", failed])
+    print_table(["并发数", "耗时(s)", "张/秒", "MB/秒", "失败"], rows)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Ollama 生成吞吐：本地桩服务器模拟固定耗时的流式生成，比较服务地址并发上限 1/2/4/8 下的请求/秒
+
+用法: python benchmarks/bench_ollama_concurrency.py [--requests 16] [--latency 0.2] [--concurrency 1,2,4,8]
+桩服务器同时处理的请求数由 --server-parallel 限制（相当于服务端 OLLAMA_NUM_PARALLEL）。
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from _common import load, print_table
+
+
+class StubOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: float, tokens: int, parallel: int):
+        super().__init__(("127.0.0.1", 0), StubOllamaHandler)
+        self.latency = latency
+        self.tokens = tokens
+        self.slots = threading.BoundedSemaphore(parallel)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json_lines(self, lines: list, delay: float = 0):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for line in lines:
+            if delay:
+                time.sleep(delay)
+            data = json.dumps(line).encode() + b"\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        # /api/tags：节点刷新模型列表
+        data = json.dumps({"models": [{"name": "stub"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        server = self.server
+        lines = [{"response": "token ", "done": False} for _ in range(server.tokens)]
+        lines.append({"response": "", "done": True, "context": [1, 2, 3], "load_duration": 0})
+        with server.slots:
+            self._send_json_lines(lines, server.latency / server.tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2, help="单个请求的模拟生成耗时（秒）")
+    parser.add_argument("--tokens", type=int, default=20, help="每个请求流式返回的片段数")
+    parser.add_argument("--server-parallel", type=int, default=8)
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    args = parser.parse_args()
+
+    server = StubOllama(args.latency, args.tokens, args.server_parallel)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    levels = [int(c) for c in args.concurrency.split(",")]
+    os.environ["OLLAMA_HOST"] = server.url
+    # 连接池不小于最大并发，避免高并发时连接用完即弃
+    os.environ.setdefault("COMFYUI_OLLAMA_POOL_SIZE", str(max(levels)))
+
+    # 先配置根日志，节点模块中写桌面日志文件的 basicConfig 不再生效
+    logging.basicConfig(level=logging.WARNING)
+    on = load("node.ollama_node")
+    ou = load("ollama_utils")
+    node = on.ComfyUI_LLM_Ollama()
+    payload = {"model": "stub", "prompt": "hi", "system": "", "context": [], "options": {}}
+    print(f"桩服务器 {server.url}：{args.requests} 个请求，单个耗时 {args.latency}s，服务端并行 {args.server_parallel}")
+
+    rows = []
+    for concurrency in levels:
+        ou.get_endpoint_semaphore(node.ollama_url).set_limit(concurrency)
+        latencies = []
+
+        def _one(_):
+            start = time.perf_counter()
+            node._request_generate(payload)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(_one, range(args.requests)))
+        seconds = time.perf_counter() - start
+        latencies.sort()
+        rows.append([concurrency, f"{seconds:.2f}", f"{args.requests / seconds:.1f}",
+                     f"{latencies[len(latencies) // 2] * 1000:.0f}"])
+    print_table(["并发上限", "耗时(s)", "请求/秒", "p50 延迟(ms)"], rows)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+视频片段解码吞吐：解码后端（opencv/ffmpeg）× 并行数 → 帧/秒
+
+用法: python benchmarks/bench_video_decode.py [视频路径] [--frames 64] [--workers 1,2,4,8]
+不传视频路径时用 ffmpeg 测试源生成 1280x720@30 的示例视频。
+"""
+import os
+import argparse
+import tempfile
+
+from _common import load, timed, make_sample_video, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("video", nargs="?")
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    vs = load("node.video_split_node")
+    video = args.video or make_sample_video(os.path.join(tempfile.gettempdir(), "comfyui_llm_bench_720p.mp4"))
+    (height, width), _ = vs._video_props(video)
+    (_, _), frame_rate = vs._probe_video(video)
+    print(f"视频: {video} {width}x{height}，解码 {args.frames} 帧，CPU 核数 {os.cpu_count()}")
+
+    rows = []
+    for backend in ("opencv", "ffmpeg"):
+        options = {} if backend == "opencv" else {
+            "backend": "ffmpeg", "source_size": (width, height), "frame_rate": frame_rate, "fps": 0,
+        }
+        for workers in (int(w) for w in args.workers.split(",")):
+            seconds, frames = timed(
+                vs._decode_frames, video, 0, args.frames, height, width, workers,
+                repeat=args.repeat, **options,
+            )
+            rows.append([backend, workers, frames.shape[0], f"{seconds:.2f}", f"{frames.shape[0] / seconds:.1f}"])
+    print_table(["后端", "并行数", "帧数", "耗时(s)", "帧/秒"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+视频合成编码档位：各 ENCODER_PROFILES 档位的编码帧/秒与输出大小
+
+用法: python benchmarks/bench_video_encode.py [--frames 60] [--profiles x264_default,x264_fast] [--threads 0]
+测试帧取自 ffmpeg 测试源生成的 1280x720 示例视频，走 CloudImagesToVideoAndUpload 的临时文件编码流程（无音频）。
+"""
+import os
+import time
+import argparse
+
+from _common import load, load_sample_frames, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--ext", default="mp4")
+    parser.add_argument("--profiles", default="", help="逗号分隔，默认全部档位")
+    parser.add_argument("--threads", type=int, default=0, help="ffmpeg -threads，0 为自动")
+    args = parser.parse_args()
+
+    import torch
+    cn = load("node.cloud_node")
+    node = cn.CloudImagesToVideoAndUpload()
+    frames = load_sample_frames(args.frames)
+    images = torch.from_numpy(frames).float().div_(255.)
+    profiles = args.profiles.split(",") if args.profiles else list(cn.ENCODER_PROFILES)
+    print(f"{len(frames)} 帧 {frames.shape[2]}x{frames.shape[1]}@{args.fps}，容器 {args.ext}，CPU 核数 {os.cpu_count()}")
+
+    rows = []
+    for profile in profiles:
+        encoder_args = cn._encoder_args(profile, threads=args.threads)
+        start = time.perf_counter()
+        path = node._encode_to_file(images, args.fps, args.ext, None, encoder_args)
+        seconds = time.perf_counter() - start
+        size = os.path.getsize(path)
+        os.remove(path)
+        rows.append([profile, f"{len(frames) / seconds:.1f}", f"{size / 1024 / 1024:.2f}",
+                     f"{size * 8 / (len(frames) / args.fps) / 1000:.0f}"])
+    print_table(["档位", "编码帧/秒", "大小(MB)", "码率(kbps)"], rows)
+
+
+if __name__ == "__main__":
+    main()
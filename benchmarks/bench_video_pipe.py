@@ -0,0 +1,78 @@
+"""
+图片合成视频的帧转换与管道写入：分批向量化转换（当前实现）与旧版逐帧 PIL 列表 → 帧/秒、峰值内存
+
+用法: python benchmarks/bench_video_pipe.py [--frames 300] [--size 1920x1080] [--paths chunked,pil_list]
+ffmpeg 读取 rawvideo 后直接丢弃（-f null），只测转换与管道写入，不含编码耗时。
+每种实现在独立子进程中运行，峰值 RSS 互不影响。1080p×300 帧的 float32 输入本身约 7.5GB，
+因此输入为单帧的零步长视图（expand），峰值增量只反映转换缓冲与中间结果。
+"""
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+from _common import load, peak_rss_mb, print_table
+
+
+def _pil_list_frames(images):
+    """旧版实现：整段视频先转为 PIL 图片列表，再逐帧 tobytes"""
+    import numpy as np
+    from PIL import Image
+    arr = images.cpu().numpy() if hasattr(images, 'cpu') else images
+    img_list = [Image.fromarray(np.clip(255. * img, 0, 255).astype(np.uint8)) for img in arr]
+    for im in img_list:
+        yield im.convert('RGB').tobytes()
+
+
+def run_child(path: str, frames: int, width: int, height: int):
+    import torch
+    import imageio_ffmpeg
+    cn = load("node.cloud_node")
+    node = cn.CloudImagesToVideoAndUpload()
+    images = torch.rand(1, height, width, 3).expand(frames, -1, -1, -1)
+    generate = node._frame_bytes if path == "chunked" else _pil_list_frames
+    base = peak_rss_mb()
+
+    cmd = [imageio_ffmpeg.get_ffmpeg_exe(), '-v', 'error', *node._video_input_args(images, 30), '-f', 'null', '-']
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    for data in generate(images):
+        proc.stdin.write(data)
+    proc.stdin.close()
+    proc.wait()
+    seconds = time.perf_counter() - start
+    print(json.dumps({"seconds": seconds, "base_rss": base, "peak_rss": peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--size", default="1920x1080")
+    parser.add_argument("--paths", default="chunked,pil_list")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split("x"))
+
+    if args.child:
+        run_child(args.child, args.frames, width, height)
+        return
+
+    print(f"{args.frames} 帧 {width}x{height}，rgb24 共 {args.frames * width * height * 3 / 1024 / 1024:.0f}MB")
+    rows = []
+    for path in args.paths.split(","):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", path, "--frames", str(args.frames), "--size", args.size],
+            stdout=subprocess.PIPE, text=True,
+        )
+        if proc.returncode != 0:
+            rows.append([path, "-", "-", f"失败（退出码 {proc.returncode}）"])
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        rows.append([path, f"{args.frames / result['seconds']:.1f}", f"{result['peak_rss']:.0f}",
+                     f"{result['peak_rss'] - result['base_rss']:.0f}"])
+    print_table(["实现", "帧/秒", "峰值 RSS(MB)", "转换增量(MB)"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,138 @@
 import os
 import json
+import threading
+
+# 配置文件路径 -> (mtime, 完整配置)，文件修改后自动失效
+_config_cache = {}
+_config_cache_lock = threading.Lock()
+
+EMPTY_CLOUD_CONFIG = {"access_key": "", "secret_key": "", "bucket_name": "", "domain": ""}
+
+
+def _find_config_path():
+    """优先本目录下 cloud_config.json，其次上级目录"""
+    local_path = os.path.join(os.path.dirname(__file__), "cloud_config.json")
+    parent_path = os.path.join(os.path.dirname(__file__), "..", "cloud_config.json")
+    if os.path.exists(local_path):
+        return local_path
+    if os.path.exists(parent_path):
+        return parent_path
+    return None
+
+
+def _read_config(config_path=None):
+    """读取完整配置文件，按 mtime 缓存；文件不存在时返回 None"""
+    if config_path is None:
+        config_path = _find_config_path()
+        if config_path is None:
+            return None
+    try:
+        mtime = os.path.getmtime(config_path)
+    except OSError:
+        return None
+    with _config_cache_lock:
+        cached = _config_cache.get(config_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    with _config_cache_lock:
+        _config_cache[config_path] = (mtime, config)
+    return config
 
 
 def load_cloud_config(config_path=None):
     """
     通用多云配置读取工具方法，返回 (cloud_type, config) 元组。
     config_path 可选，默认自动定位到 cloud_config.json。
+    解析结果按文件 mtime 缓存，文件未修改时不会重复读取磁盘。
     """
-    if config_path is None:
-        # 优先本目录下 cloud_config.json
-        local_path = os.path.join(os.path.dirname(__file__), "cloud_config.json")
-        parent_path = os.path.join(os.path.dirname(__file__), "..", "cloud_config.json")
-        if os.path.exists(local_path):
-            config_path = local_path
-        elif os.path.exists(parent_path):
-            config_path = parent_path
-        else:
-            # 返回空配置，避免节点加载时报错
-            return "qiniu", {"access_key": "", "secret_key": "", "bucket_name": "", "domain": ""}
-    if not os.path.exists(config_path):
-        return "qiniu", {"access_key": "", "secret_key": "", "bucket_name": "", "domain": ""}
-    with open(config_path, "r", encoding="utf-8") as f:
-        config = json.load(f)
+    config = _read_config(config_path)
+    if config is None:
+        # 返回空配置，避免节点加载时报错
+        return "qiniu", dict(EMPTY_CLOUD_CONFIG)
     cloud_type = config.get("cloud_type", "qiniu")
-    cloud_config = config.get(cloud_type, {})
-    return cloud_type, cloud_config
+    return cloud_type, dict(config.get(cloud_type, {}))
+
+
+def load_backend_config(cloud_type: str, config_path=None) -> dict:
+    """读取指定云类型的配置段（如 upload_host、endpoint_url 等后端参数），不存在时返回空字典"""
+    config = _read_config(config_path)
+    if config is None:
+        return {}
+    return dict(config.get(cloud_type, {}))
 
 
 class CloudUploader:
     """
-    云存储上传抽象基类，所有云厂商需实现 upload_binary 方法
+    云存储上传抽象基类，所有云厂商需实现 upload_binary 与 url_for 方法，
+    并通过 register_backend 按 cloud_type 注册
     """
 
     def upload_binary(self, data: bytes, key: str = None) -> str:
-        raise NotImplementedError("upload_binary 必须由子类实现")
\ No newline at end of file
+        raise NotImplementedError("upload_binary 必须由子类实现")
+
+    def url_for(self, key: str) -> str:
+        """
+        根据对象 key 计算上传后的外链 URL（不发起上传），
+        供异步上传队列在入队时即返回确定的 URL。
+        """
+        raise NotImplementedError("url_for 必须由子类实现")
+
+    def stat_hash(self, key: str):
+        """
+        查询云端已存在对象的内容哈希（七牛 etag 格式），不存在或不支持时返回 None。
+        用于内容寻址上传时确认对象已存在，从而跳过上传。
+        """
+        return None
+
+    def upload_file(self, path: str, key: str = None) -> str:
+        """
+        上传本地文件，默认整体读入内存后调用 upload_binary；
+        支持分片上传的云厂商应重写此方法以流式读取磁盘。
+        """
+        with open(path, "rb") as f:
+            return self.upload_binary(f.read(), key)
+
+    def upload_stream(self, stream, key: str = None, on_eof=None) -> str:
+        """
+        上传长度未知的流（如 ffmpeg 的 stdout），默认读完后调用 upload_binary。
+        on_eof 在流读取完毕、正式提交前调用，抛出异常即放弃本次上传。
+        """
+        data = stream.read()
+        if on_eof is not None:
+            on_eof()
+        return self.upload_binary(data, key)
+
+
+# cloud_type -> 工厂函数 factory(access_key, secret_key, bucket_name, domain, config) -> CloudUploader
+_backends = {}
+# (cloud_type, access_key, secret_key, bucket_name, domain) -> 上传器实例，进程内复用
+_uploaders = {}
+_uploaders_lock = threading.Lock()
+
+
+def register_backend(cloud_type: str, factory):
+    """注册云存储后端，cloud_type 对应 cloud_config.json 中的 cloud_type 与配置段名"""
+    _backends[cloud_type] = factory
+
+
+def list_backends() -> list:
+    return list(_backends)
+
+
+def get_uploader(cloud_type: str, access_key: str, secret_key: str, bucket_name: str, domain: str) -> CloudUploader:
+    """
+    按 cloud_type 获取共享的上传器，相同后端、凭证与空间只创建一次（复用连接池与上传凭证）。
+    后端参数取自 cloud_config.json 中对应的配置段。
+    """
+    factory = _backends.get(cloud_type)
+    if factory is None:
+        raise NotImplementedError(f"暂不支持的云类型: {cloud_type}，可选: {', '.join(_backends)}")
+    key = (cloud_type, access_key, secret_key, bucket_name, domain)
+    with _uploaders_lock:
+        uploader = _uploaders.get(key)
+        if uploader is None:
+            uploader = factory(access_key, secret_key, bucket_name, domain, load_backend_config(cloud_type))
+            _uploaders[key] = uploader
+        return uploader
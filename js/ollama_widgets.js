@@ -1,34 +1,80 @@
+import { app } from "../../scripts/app.js";
+import { api } from "../../scripts/api.js";
+import { ComfyWidgets } from "../../scripts/widgets.js";
+
+// 支持流式输出预览的节点
+const STREAM_NODES = ["ComfyUI_LLM_Ollama", "DeepSeek_Online"];
+
+// 获取（或创建）节点上的流式输出预览框
+function getStreamWidget(node) {
+    let widget = node.widgets?.find(w => w.name === "stream_preview");
+    if (!widget) {
+        widget = ComfyWidgets["STRING"](node, "stream_preview", ["STRING", { multiline: true }], app).widget;
+        widget.inputEl.readOnly = true;
+        widget.inputEl.style.opacity = 0.7;
+        widget.options.serialize = false;  // 预览内容不作为节点输入提交
+    }
+    return widget;
+}
+
 app.registerExtension({
     name: "comfy.ollama.widgets",
-    
+
+    async setup() {
+        // 接收后端推送的增量文本并实时渲染
+        api.addEventListener("comfyui_llm.stream", ({ detail }) => {
+            const node = app.graph.getNodeById(Number(detail.node));
+            if (!node) {
+                return;
+            }
+            const widget = getStreamWidget(node);
+            if (detail.reset) {
+                widget.value = "";
+            }
+            if (detail.text) {
+                widget.value += detail.text;
+                widget.inputEl.scrollTop = widget.inputEl.scrollHeight;
+            }
+            app.graph.setDirtyCanvas(true, false);
+        });
+    },
+
     async beforeRegisterNodeDef(nodeType, nodeData) {
+        if (STREAM_NODES.includes(nodeData.name)) {
+            const originalOnNodeCreated = nodeType.prototype.onNodeCreated;
+            nodeType.prototype.onNodeCreated = function () {
+                originalOnNodeCreated?.apply(this, arguments);
+                getStreamWidget(this);
+            };
+        }
+
         if (nodeData.name === "ComfyUI_LLM_Ollama") {
             // 重写节点模板
             const originalOnExecuted = nodeType.prototype.onExecuted;
             nodeType.prototype.onExecuted = function (message) {
                 originalOnExecuted?.apply(this, arguments);
-                
+
                 // 添加可调整大小的文本域
                 setTimeout(() => {
                     // 为prompt和system_message添加特性
                     this.querySelectorAll(
-                        'textarea[data-input-name="prompt"],' + 
+                        'textarea[data-input-name="prompt"],' +
                         'textarea[data-input-name="system_message"]'
                     ).forEach(textarea => {
                         // 添加可调整样式
                         textarea.style.resize = 'vertical';
                         textarea.style.minHeight = '100px';
                         textarea.style.overflowY = 'auto';
-                        
+
                         // 添加拖动记忆功能
                         const storeKey = `ollamaTextareaSize_${nodeData.name}_${textarea.dataset.inputName}`;
-                        
+
                         // 从本地存储读取高度
                         const savedHeight = localStorage.getItem(storeKey);
                         if (savedHeight) {
                             textarea.style.height = savedHeight + 'px';
                         }
-                        
+
                         // 监听高度变化
                         textarea.addEventListener('mouseup', () => {
                             localStorage.setItem(storeKey, textarea.offsetHeight);
@@ -38,4 +84,4 @@ app.registerExtension({
             };
         }
     }
-});
\ No newline at end of file
+});
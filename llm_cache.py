@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Optional
+
+
+def _env_number(name: str, default):
+    """读取数值环境变量，非法值回退默认值"""
+    try:
+        return type(default)(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def make_cache_key(namespace: str, request: Any) -> str:
+    """
+    根据请求内容计算缓存键（内容寻址）。
+    request 需为可 JSON 序列化对象，如模型、提示词、系统提示、上下文、温度、max_tokens、stop 等。
+    """
+    raw = json.dumps([namespace, request], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    基于 SQLite 的 LLM 响应持久化缓存
+
+    - 以请求内容哈希为键
+    - 按最近访问时间淘汰（LRU），同时限制条目数与总字节数
+    - 支持 TTL 过期
+    """
+
+    def __init__(self, path: str, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed)")
+
+    def get(self, key: str) -> Optional[Any]:
+        """命中返回反序列化后的值，未命中或已过期返回 None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl > 0 and now - created > self.ttl:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def put(self, key: str, value: Any):
+        """写入缓存并按 LRU 淘汰超出限制的条目"""
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        if self.max_bytes > 0 and size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, data, size, now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        """淘汰过期条目，再按最近访问时间淘汰超出条目数/字节数限制的部分"""
+        if self.ttl > 0:
+            self._conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if (self.max_entries <= 0 or count <= self.max_entries) and (self.max_bytes <= 0 or total <= self.max_bytes):
+            return
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC").fetchall()
+        stale = []
+        for key, size in rows:
+            if (self.max_entries <= 0 or count <= self.max_entries) and (self.max_bytes <= 0 or total <= self.max_bytes):
+                break
+            stale.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """
+    获取进程内共享的响应缓存（Ollama 与 DeepSeek 节点共用）。
+    可通过环境变量配置：
+    COMFYUI_LLM_CACHE_PATH、COMFYUI_LLM_CACHE_MAX_ENTRIES、COMFYUI_LLM_CACHE_MAX_MB、COMFYUI_LLM_CACHE_TTL（秒，0 表示不过期）
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            path = os.environ.get("COMFYUI_LLM_CACHE_PATH") or os.path.join(os.path.dirname(__file__), "llm_cache.sqlite3")
+            _cache = LLMResponseCache(
+                path,
+                max_entries=_env_number("COMFYUI_LLM_CACHE_MAX_ENTRIES", 1000),
+                max_bytes=int(_env_number("COMFYUI_LLM_CACHE_MAX_MB", 64.0) * 1024 * 1024),
+                ttl=_env_number("COMFYUI_LLM_CACHE_TTL", 7 * 24 * 3600.0),
+            )
+        return _cache
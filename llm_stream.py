@@ -0,0 +1,48 @@
+import logging
+
+# 前端 js/ollama_widgets.js 监听的 websocket 事件名
+STREAM_EVENT = "comfyui_llm.stream"
+
+logger = logging.getLogger("ComfyUI-LLM-Stream")
+
+
+def send_stream_text(node_id, text: str = "", reset: bool = False, done: bool = False):
+    """
+    通过 PromptServer websocket 将增量文本推送到前端节点。
+    node_id 为节点的 UNIQUE_ID；不在 ComfyUI 环境中运行或未传入 node_id 时静默忽略。
+    """
+    if node_id is None:
+        return
+    try:
+        from server import PromptServer
+        PromptServer.instance.send_sync(STREAM_EVENT, {
+            "node": str(node_id),
+            "text": text,
+            "reset": reset,
+            "done": done,
+        })
+    except Exception as e:
+        logger.debug(f"流式推送失败: {str(e)}")
+
+
+class StreamBuffer:
+    """
+    流式响应缓冲区：逐段追加并实时推送到前端，最终以 join 一次性拼接，避免字符串反复拼接。
+    """
+
+    def __init__(self, node_id=None):
+        self.node_id = node_id
+        self.parts = []
+        send_stream_text(node_id, reset=True)
+
+    def append(self, text: str):
+        if not text:
+            return
+        self.parts.append(text)
+        send_stream_text(self.node_id, text)
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+    def close(self):
+        send_stream_text(self.node_id, done=True)
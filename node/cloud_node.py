@@ -1,24 +1,179 @@
 import os
-from qiniu import Auth, put_data
 import io
-from PIL import Image
-import numpy as np
-import uuid
-import os
+import json
+import math
+import time
 import uuid
+import base64
+import hashlib
+import threading
+import shutil
 import tempfile
 import subprocess
-import imageio_ffmpeg
-from ..cloud_utils import load_cloud_config, CloudUploader
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from ..cloud_utils import load_cloud_config, load_backend_config, CloudUploader, register_backend, get_uploader
+from ..upload_queue import get_upload_queue, resume_pending, register_routes
+from ..upload_index import get_upload_index, qiniu_etag, qiniu_etag_file
+
+# qiniu、boto3、PIL、numpy、imageio_ffmpeg 等依赖在节点执行时才导入，避免拖慢 ComfyUI 启动
+
+
+class QiniuMultipartUpload:
+    """
+    七牛分片上传 v2 会话：初始化 → 并行上传分片 → 合并
+    接口文档: https://developer.qiniu.com/kodo/6364/multipartupload-interface
+    """
+
+    def __init__(self, uploader, key: str = None, upload_id: str = None):
+        self.uploader = uploader
+        self.key = key
+        self.upload_id = upload_id
+        self.expire_at = None
+        # 分片上传可能持续较久，使用单独签发的完整有效期凭证，不复用可能临近过期的前缀缓存凭证
+        self.token = uploader._multipart_token(key)
+        encoded_key = base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii") if key is not None else "~"
+        self.base_url = f"{uploader._get_upload_host(self.token)}/buckets/{uploader.bucket_name}/objects/{encoded_key}/uploads"
+
+    def _request(self, method: str, url: str, headers: dict = None, **kwargs):
+        """发送请求；凭证过期返回 401 时重新签发凭证并重试一次"""
+        for attempt in range(2):
+            response = self.uploader._get_session().request(
+                method, url, headers={**(headers or {}), "Authorization": f"UpToken {self.token}"}, **kwargs
+            )
+            if response.status_code != 401 or attempt:
+                break
+            self.token = self.uploader._multipart_token(self.key)
+        response.raise_for_status()
+        return response
+
+    def init(self) -> str:
+        """初始化分片上传任务，返回 uploadId"""
+        ret = self._request("POST", self.base_url, timeout=30).json()
+        self.upload_id = ret["uploadId"]
+        self.expire_at = ret.get("expireAt")
+        return self.upload_id
+
+    def upload_part(self, part_number: int, data: bytes, retries: int = 3) -> str:
+        """上传单个分片（失败按指数退避重试），返回分片 etag"""
+        import requests
+        for attempt in range(retries):
+            try:
+                response = self._request(
+                    "PUT", f"{self.base_url}/{self.upload_id}/{part_number}",
+                    data=data,
+                    headers={"Content-Type": "application/octet-stream"},
+                    timeout=(10, 300),
+                )
+                return response.json()["etag"]
+            except requests.RequestException as e:
+                # 612: 上传任务不存在或已过期，重试无意义
+                status = getattr(e.response, "status_code", None)
+                if attempt == retries - 1 or status == 612:
+                    raise
+                time.sleep(2 ** attempt)
+
+    def complete(self, etags: dict, fname: str = None) -> dict:
+        """按分片序号合并，返回七牛响应（含 key、hash）"""
+        body = {"parts": [{"partNumber": n, "etag": etags[n]} for n in sorted(etags)]}
+        if fname:
+            body["fname"] = fname
+        return self._request("POST", f"{self.base_url}/{self.upload_id}", json=body, timeout=60).json()
+
 
+class QiniuUploader(CloudUploader):
+    # 上传凭证有效期与提前续签时间（秒）
+    TOKEN_EXPIRES = 3600
+    TOKEN_REFRESH_MARGIN = 300
+    DEFAULT_UPLOAD_HOST = "https://upload.qiniup.com"
 
-class QiniuUploader:
-    def __init__(self, access_key: str, secret_key: str, bucket_name: str, domain: str,):
+    def __init__(self, access_key: str, secret_key: str, bucket_name: str, domain: str,
+                 upload_host: str = None, part_size: int = 4 * 1024 * 1024, concurrency: int = 3):
         self.access_key = access_key
         self.secret_key = secret_key
         self.bucket_name = bucket_name
         self.domain = domain
+        # 分片上传参数：upload_host 为空时按凭证自动查询所在区域
+        self.upload_host = upload_host
+        self.part_size = part_size
+        self.concurrency = concurrency
+        from qiniu import Auth
         self.q = Auth(self.access_key, self.secret_key)
+        # 前缀 -> (token, 过期时间)
+        self._tokens = {}
+        self._tokens_lock = threading.Lock()
+        self._session = None
+
+    def _get_session(self):
+        """分片上传共用的 keep-alive 会话"""
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=max(self.concurrency, 4))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+        return self._session
+
+    def _get_upload_host(self, token: str) -> str:
+        """分片上传域名：优先使用配置，其次通过七牛 SDK 按空间区域查询"""
+        if not self.upload_host:
+            try:
+                from qiniu import Region
+                host = Region().get_up_host_by_token(token, None)
+            except Exception as e:
+                print(f"查询七牛上传域名失败，使用默认域名: {e}")
+                host = self.DEFAULT_UPLOAD_HOST
+            if not host.startswith("http://") and not host.startswith("https://"):
+                host = "https://" + host
+            self.upload_host = host
+        return self.upload_host.rstrip("/")
+
+    def _upload_token(self, key: str = None) -> str:
+        """
+        获取上传凭证：按 key 所在目录签发前缀范围（isPrefixalScope）的凭证并缓存，
+        同一目录下的对象在凭证临近过期前复用同一凭证，避免每个对象都重新签名。
+        """
+        prefix = key.rsplit("/", 1)[0] + "/" if key and "/" in key else None
+        now = time.time()
+        with self._tokens_lock:
+            cached = self._tokens.get(prefix)
+            if cached is not None and cached[1] - self.TOKEN_REFRESH_MARGIN > now:
+                return cached[0]
+            if prefix is None:
+                token = self.q.upload_token(self.bucket_name, key, self.TOKEN_EXPIRES)
+                if key is not None:
+                    # 无目录的 key 使用精确范围凭证，不缓存
+                    return token
+            else:
+                token = self.q.upload_token(self.bucket_name, prefix, self.TOKEN_EXPIRES, {"isPrefixalScope": 1})
+            self._tokens[prefix] = (token, now + self.TOKEN_EXPIRES)
+            return token
+
+    def _multipart_token(self, key: str = None) -> str:
+        """分片上传会话专用凭证：每次按 key 精确范围重新签发，有效期完整，不进入缓存"""
+        return self.q.upload_token(self.bucket_name, key, self.TOKEN_EXPIRES)
+
+    def _build_url(self, real_key: str) -> str:
+        url = f"{self.domain}/{real_key}"
+        if not url.startswith("http://") and not url.startswith("https://"):
+            url = "http://" + url.lstrip("/")
+        return url
+
+    def url_for(self, key: str) -> str:
+        return self._build_url(key)
+
+    def stat_hash(self, key: str):
+        """通过 BucketManager.stat 查询对象的 etag，对象不存在时返回 None"""
+        from qiniu import BucketManager
+        ret, info = BucketManager(self.q).stat(self.bucket_name, key)
+        if ret is None:
+            if info.status_code != 612:
+                print(f"七牛 stat 查询失败: {info}")
+            return None
+        return ret.get("hash")
 
     def upload_binary(self, data: bytes, key: str = None) -> str:
         """
@@ -27,7 +182,8 @@ class QiniuUploader:
         :param key: 文件名（可选），不传则由七牛自动生成
         :return: 文件外链URL
         """
-        token = self.q.upload_token(self.bucket_name, key, 3600)
+        from qiniu import put_data
+        token = self._upload_token(key)
         ret, info = put_data(token, key, data)
         print(f"七牛 put_data 返回 ret: {ret}, info: {info}")  # 打印上传结果
         # 七牛 put_data 返回 ret 可能为 None，info.key 才是真实 key
@@ -37,12 +193,345 @@ class QiniuUploader:
         elif hasattr(info, 'key') and info.key:
             real_key = info.key
         if real_key:
-            url = f"{self.domain}/{real_key}"
+            return self._build_url(real_key)
+        else:
+            raise Exception(f"上传失败: {info}")
+
+    def _record_path(self, path: str, size: int) -> str:
+        """断点续传记录文件，按空间与本地文件路径/大小/修改时间区分"""
+        record_dir = os.path.join(tempfile.gettempdir(), "comfyui_llm_upload_records")
+        os.makedirs(record_dir, exist_ok=True)
+        ident = f"{self.bucket_name}:{os.path.abspath(path)}:{size}:{os.path.getmtime(path)}"
+        return os.path.join(record_dir, hashlib.sha1(ident.encode("utf-8")).hexdigest() + ".json")
+
+    def upload_file(self, path: str, key: str = None) -> str:
+        """
+        上传本地文件：小文件走表单上传；超过分片大小时使用分片上传 v2，
+        各分片由线程池按需从磁盘读取并并行上传（内存占用约为 并发数 × 分片大小），
+        已完成的分片记录在本地，中断后再次上传同一文件会从断点继续。
+        """
+        import requests
+        size = os.path.getsize(path)
+        if size <= self.part_size:
+            return super().upload_file(path, key)
+
+        record_path = self._record_path(path, size)
+        record = None
+        if os.path.exists(record_path):
+            try:
+                with open(record_path, "r", encoding="utf-8") as f:
+                    record = json.load(f)
+                # 任务临近过期则重新开始
+                if record.get("expire_at") and record["expire_at"] < time.time() + 3600:
+                    record = None
+            except (OSError, ValueError):
+                record = None
+
+        if record is not None:
+            # 续传沿用上次的 key 与 uploadId
+            key = record["key"]
+            upload = QiniuMultipartUpload(self, key, record["upload_id"])
+            print(f"七牛分片上传续传: {path}，已完成 {len(record['parts'])} 个分片")
+        else:
+            upload = QiniuMultipartUpload(self, key)
+            upload.init()
+            record = {"key": key, "upload_id": upload.upload_id, "expire_at": upload.expire_at, "parts": {}}
+
+        etags = {int(n): etag for n, etag in record["parts"].items()}
+        record_lock = threading.Lock()
+
+        def _save_record():
+            with open(record_path, "w", encoding="utf-8") as f:
+                json.dump(record, f)
+
+        def _upload_part(part_number):
+            with open(path, "rb") as f:
+                f.seek((part_number - 1) * self.part_size)
+                data = f.read(self.part_size)
+            etag = upload.upload_part(part_number, data)
+            with record_lock:
+                etags[part_number] = etag
+                record["parts"][str(part_number)] = etag
+                _save_record()
+
+        _save_record()
+        pending = [n for n in range(1, math.ceil(size / self.part_size) + 1) if n not in etags]
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                list(executor.map(_upload_part, pending))
+            ret = upload.complete(etags, os.path.basename(path))
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 612:
+                # 上传任务已失效，清除记录以便下次重新上传
+                os.remove(record_path)
+            raise
+        os.remove(record_path)
+        print(f"七牛分片上传完成: {ret}")
+        return self._build_url(ret.get("key") or key)
+
+    def upload_stream(self, stream, key: str = None, on_eof=None) -> str:
+        """
+        边读边传：从流中按分片大小读取数据并提交到线程池并行上传，
+        同时在途的分片数不超过并发数，内存占用与流总长度无关。
+        不足一个分片的短流直接走表单上传。
+        """
+        first = _read_exactly(stream, self.part_size)
+        if len(first) < self.part_size:
+            if on_eof is not None:
+                on_eof()
+            return self.upload_binary(first, key)
+
+        upload = QiniuMultipartUpload(self, key)
+        upload.init()
+        etags = {}
+        in_flight = threading.BoundedSemaphore(self.concurrency)
+        failed = threading.Event()
+
+        def _upload_part(part_number, data):
+            try:
+                etags[part_number] = upload.upload_part(part_number, data)
+            except Exception:
+                failed.set()
+                raise
+            finally:
+                in_flight.release()
+
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            part_number, data = 1, first
+            while data:
+                in_flight.acquire()
+                if failed.is_set():
+                    # 已有分片失败，停止读取，由调用方终止数据源
+                    in_flight.release()
+                    break
+                futures.append(executor.submit(_upload_part, part_number, data))
+                part_number += 1
+                data = _read_exactly(stream, self.part_size)
+        for future in futures:
+            future.result()
+        if on_eof is not None:
+            on_eof()
+        ret = upload.complete(etags)
+        print(f"七牛流式分片上传完成: {ret}")
+        return self._build_url(ret.get("key") or key)
+
+
+def _create_qiniu_uploader(access_key: str, secret_key: str, bucket_name: str, domain: str, config: dict) -> QiniuUploader:
+    return QiniuUploader(
+        access_key, secret_key, bucket_name, domain,
+        upload_host=config.get("upload_host"),
+        part_size=int(float(config.get("part_size_mb", 4)) * 1024 * 1024),
+        concurrency=int(config.get("upload_concurrency", 3)),
+    )
+
+
+class S3Uploader(CloudUploader):
+    """
+    S3 兼容对象存储上传实现（AWS S3、MinIO、R2、OSS/COS 的 S3 接口等，需安装 boto3）
+    cloud_config.json 配置段 "s3" 可选参数：endpoint_url、region、addressing_style、part_size_mb、upload_concurrency
+    domain 为空时 URL 按 endpoint_url/bucket/key 拼接
+    """
+
+    def __init__(self, access_key: str, secret_key: str, bucket_name: str, domain: str, endpoint_url: str = None,
+                 region: str = None, addressing_style: str = "auto", part_size: int = 8 * 1024 * 1024, concurrency: int = 4):
+        import boto3
+        from botocore.config import Config
+        from boto3.s3.transfer import TransferConfig
+        self.bucket_name = bucket_name
+        self.domain = domain
+        self.endpoint_url = endpoint_url
+        self.region = region
+        # 连接池大小与分片并发数匹配，节点多线程共用同一 client
+        self.client = boto3.client(
+            "s3",
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            config=Config(
+                max_pool_connections=max(concurrency * 2, 10),
+                retries={"max_attempts": 5, "mode": "adaptive"},
+                s3={"addressing_style": addressing_style},
+            ),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=concurrency,
+        )
+
+    def url_for(self, key: str) -> str:
+        if self.domain:
+            url = f"{self.domain.rstrip('/')}/{key}"
+            if not url.startswith("http://") and not url.startswith("https://"):
+                url = "https://" + url.lstrip("/")
+            return url
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket_name}/{key}"
+        region = self.region or "us-east-1"
+        return f"https://{self.bucket_name}.s3.{region}.amazonaws.com/{key}"
+
+    def upload_binary(self, data: bytes, key: str = None) -> str:
+        key = key or uuid.uuid4().hex
+        self.client.put_object(Bucket=self.bucket_name, Key=key, Body=data)
+        return self.url_for(key)
+
+    def upload_file(self, path: str, key: str = None) -> str:
+        """超过分片大小时由 boto3 自动并行分片上传，按需从磁盘读取"""
+        key = key or uuid.uuid4().hex
+        self.client.upload_file(path, self.bucket_name, key, Config=self.transfer_config)
+        return self.url_for(key)
+
+    def upload_stream(self, stream, key: str = None, on_eof=None) -> str:
+        """
+        边读边传：boto3 按分片大小读取流并并行上传，读到流末尾时先调用 on_eof，
+        其抛出的异常会使 boto3 中止分片上传任务，不会留下不完整的对象。
+        """
+        key = key or uuid.uuid4().hex
+        self.client.upload_fileobj(_EofCallbackReader(stream, on_eof), self.bucket_name, key, Config=self.transfer_config)
+        return self.url_for(key)
+
+
+class _EofCallbackReader:
+    """包装只读流，首次读到末尾时调用回调"""
+
+    def __init__(self, stream, on_eof=None):
+        self.stream = stream
+        self.on_eof = on_eof
+
+    def read(self, size=-1):
+        data = self.stream.read(size) if size is not None and size >= 0 else self.stream.read()
+        if not data and self.on_eof is not None:
+            on_eof, self.on_eof = self.on_eof, None
+            on_eof()
+        return data
+
+
+def _create_s3_uploader(access_key: str, secret_key: str, bucket_name: str, domain: str, config: dict) -> S3Uploader:
+    return S3Uploader(
+        access_key, secret_key, bucket_name, domain,
+        endpoint_url=config.get("endpoint_url"),
+        region=config.get("region"),
+        addressing_style=config.get("addressing_style", "auto"),
+        part_size=int(float(config.get("part_size_mb", 8)) * 1024 * 1024),
+        concurrency=int(config.get("upload_concurrency", 4)),
+    )
+
+
+class LocalUploader(CloudUploader):
+    """
+    本地目录“云存储”：对象写入 bucket_name 指定的目录，domain 为对外提供该目录的 HTTP 地址
+    （如 nginx 或 python -m http.server），domain 为空时返回 file:// URL。
+    不依赖网络与云账号，可离线验证/压测完整的上传链路（去重、异步队列等）。
+    """
+
+    def __init__(self, root: str, domain: str = ""):
+        self.root = os.path.abspath(os.path.expanduser(root or os.path.join(tempfile.gettempdir(), "comfyui_llm_uploads")))
+        self.domain = domain
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path_for(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"非法的对象 key: {key}")
+        return path
+
+    def url_for(self, key: str) -> str:
+        if self.domain:
+            url = f"{self.domain.rstrip('/')}/{key}"
             if not url.startswith("http://") and not url.startswith("https://"):
                 url = "http://" + url.lstrip("/")
             return url
-        else:
-            raise Exception(f"上传失败: {info}")
+        return "file://" + self._path_for(key).replace(os.sep, "/")
+
+    def _write(self, key: str, writer) -> str:
+        """先写入同目录临时文件再原子替换，读者不会看到写了一半的对象"""
+        key = key or uuid.uuid4().hex
+        path = self._path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(tmp_path, "wb") as f:
+                writer(f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return self.url_for(key)
+
+    def upload_binary(self, data: bytes, key: str = None) -> str:
+        return self._write(key, lambda f: f.write(data))
+
+    def upload_file(self, path: str, key: str = None) -> str:
+        def _copy(f):
+            with open(path, "rb") as src:
+                shutil.copyfileobj(src, f, 1024 * 1024)
+        return self._write(key, _copy)
+
+    def upload_stream(self, stream, key: str = None, on_eof=None) -> str:
+        def _copy(f):
+            shutil.copyfileobj(stream, f, 1024 * 1024)
+            if on_eof is not None:
+                on_eof()
+        return self._write(key, _copy)
+
+    def stat_hash(self, key: str):
+        path = self._path_for(key)
+        return qiniu_etag_file(path) if os.path.isfile(path) else None
+
+
+def _create_local_uploader(access_key: str, secret_key: str, bucket_name: str, domain: str, config: dict) -> LocalUploader:
+    return LocalUploader(bucket_name or config.get("root", ""), domain)
+
+
+register_backend("qiniu", _create_qiniu_uploader)
+register_backend("s3", _create_s3_uploader)
+register_backend("local", _create_local_uploader)
+
+
+# 凭证指纹 -> (access_key, secret_key)：异步上传任务只持久化指纹，密钥仅保存在内存中
+_credentials = {}
+_credentials_lock = threading.Lock()
+
+
+def _credential_fingerprint(access_key: str, secret_key: str) -> str:
+    return hashlib.sha256(f"{access_key}:{secret_key}".encode("utf-8")).hexdigest()[:16]
+
+
+def _lookup_credentials(cloud_type: str, fingerprint: str):
+    """按指纹查找密钥：先查本进程入队时记录的凭证，进程重启后再从 cloud_config.json 中匹配"""
+    with _credentials_lock:
+        credentials = _credentials.get(fingerprint)
+    if credentials is not None:
+        return credentials
+    config = load_backend_config(cloud_type)
+    access_key, secret_key = config.get("access_key", ""), config.get("secret_key", "")
+    if _credential_fingerprint(access_key, secret_key) == fingerprint:
+        return access_key, secret_key
+    return None
+
+
+def _uploader_from_spec(spec: dict) -> CloudUploader:
+    """异步上传队列的上传器工厂：根据入队时记录的云类型、空间与凭证指纹还原上传器"""
+    cloud_type = spec.get("cloud_type", "qiniu")
+    credentials = _lookup_credentials(cloud_type, spec["credential"])
+    if credentials is None:
+        raise Exception("找不到上传凭证（进程重启后只能从 cloud_config.json 匹配），请重新运行使用该凭证的上传节点")
+    return get_uploader(cloud_type, credentials[0], credentials[1], spec["bucket_name"], spec["domain"])
+
+
+def _upload_spec(cloud_type, access_key, secret_key, bucket_name, domain) -> dict:
+    """异步上传任务的上传配置（会写入暂存目录），不包含密钥"""
+    fingerprint = _credential_fingerprint(access_key, secret_key)
+    with _credentials_lock:
+        _credentials[fingerprint] = (access_key, secret_key)
+    return {
+        "cloud_type": cloud_type,
+        "credential": fingerprint,
+        "bucket_name": bucket_name,
+        "domain": domain,
+    }
 
 # class JDCloudUploader(CloudUploader):
 #     """
@@ -71,6 +560,216 @@ class QiniuUploader:
 #             url = "http://" + url.lstrip("/")
 #         return url
 
+def _read_exactly(stream, size: int) -> bytes:
+    """从管道中读满 size 字节（管道单次 read 可能返回更少），流结束时返回剩余部分"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _encode_image(image, format: str, options: dict = None) -> bytes:
+    """
+    将单帧图片数组 (H, W, C) 编码为指定格式的二进制。
+    image 可为 [0, 1] 浮点或已转换的 uint8；options 为传给 Pillow save 的编码参数。
+    """
+    import numpy as np
+    from PIL import Image
+    if image.dtype != np.uint8:
+        image = np.clip(255. * image, 0, 255).astype(np.uint8)
+    if image.shape[-1] == 1:
+        image = image[..., 0]
+    img = Image.fromarray(image)
+    buf = io.BytesIO()
+    if format == "GIF":
+        img = img.convert("P", palette=Image.ADAPTIVE)
+        img.save(buf, format="GIF")
+    else:
+        if format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(buf, format=format, **(options or {}))
+    return buf.getvalue()
+
+
+# JPEG 色度抽样：4:4:4 不抽样（画质最好），4:2:0 体积最小
+JPEG_SUBSAMPLING = {"4:4:4": 0, "4:2:2": 1, "4:2:0": 2}
+
+
+def _image_save_options(format: str, png_compress_level: int = 6, png_optimize: bool = False,
+                        jpeg_quality: int = 75, jpeg_progressive: bool = False, jpeg_subsampling: str = "4:2:0",
+                        webp_lossless: bool = False, webp_quality: int = 80, webp_method: int = 4) -> dict:
+    """
+    各格式的 Pillow 编码参数，默认值与 Pillow 默认一致。
+    PNG compress_level 越低越快（1 约比默认 6 快数倍，体积略大），optimize 会额外多轮压缩，显著变慢；
+    WEBP method 0 最快、6 最慢但体积最小。
+    """
+    if format == "PNG":
+        return {"compress_level": png_compress_level, "optimize": png_optimize}
+    if format == "JPEG":
+        return {"quality": jpeg_quality, "progressive": jpeg_progressive,
+                "subsampling": JPEG_SUBSAMPLING.get(jpeg_subsampling, 2)}
+    if format == "WEBP":
+        return {"lossless": webp_lossless, "quality": webp_quality, "method": webp_method}
+    return {}
+
+
+# 进程内唯一的编码进程池，进程数变化时重建（旧池关闭，不累积子进程）
+_encode_pool = None
+_encode_pool_size = 0
+_encode_pool_lock = threading.Lock()
+
+
+def _get_encode_pool(workers: int):
+    """
+    图片编码进程池：zlib/libjpeg 编码受 GIL 与单核限制，多进程可按核数线性提速。
+    仅在支持 fork 的平台使用进程池（子进程直接继承已加载的模块，无需重新导入 ComfyUI），
+    其它平台返回 None，由调用方在线程中编码。
+    子进程从已加载 torch 的多线程进程 fork 而来，只做 PIL 编码、不触碰 CUDA。
+    """
+    global _encode_pool, _encode_pool_size
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    with _encode_pool_lock:
+        if _encode_pool is not None and _encode_pool_size != workers:
+            _encode_pool.shutdown(wait=False, cancel_futures=True)
+            _encode_pool = None
+        if _encode_pool is None:
+            _encode_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+            _encode_pool_size = workers
+        return _encode_pool
+
+
+def _encode_with_pool(pool, image, format: str, options: dict) -> bytes:
+    """在进程池中编码；子进程异常退出导致进程池失效时丢弃进程池（下次重建），本张改为当前线程编码"""
+    global _encode_pool
+    try:
+        return pool.submit(_encode_image, image, format, options).result()
+    except BrokenProcessPool:
+        with _encode_pool_lock:
+            if _encode_pool is pool:
+                _encode_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        return _encode_image(image, format, options)
+
+
+def _images_to_uint8(images):
+    """整批转换为 uint8 numpy 数组（张量在设备端完成转换），减少进程间传输的数据量"""
+    import numpy as np
+    if hasattr(images, 'cpu'):
+        import torch
+        return (images * 255.).clamp_(0, 255).to(torch.uint8).cpu().numpy()
+    return np.clip(255. * np.asarray(images), 0, 255).astype(np.uint8)
+
+
+def _build_key(folder: str, key_prefix: str, ext: str, name: str = None) -> str:
+    """生成 文件夹/前缀+名称.扩展名 形式的对象 key，未指定名称时使用随机名"""
+    random_name = name or uuid.uuid4().hex
+    # 拼接文件夹路径
+    folder_path = folder.strip().strip('/')
+    return f"{folder_path}/{key_prefix}{random_name}.{ext}"
+
+
+def _dedup_lookup(uploader, namespace: str, key: str, etag: str, check_stat: bool):
+    """
+    内容寻址上传前的去重检查：先查本地索引，未命中且 check_stat 时再查询云端对象哈希，
+    内容一致则返回已有 URL，否则返回 None。
+    """
+    index = get_upload_index()
+    url = index.get(namespace, key, etag)
+    if url is not None:
+        print(f"内容已上传过，跳过上传: {url}")
+        return url
+    if check_stat and uploader.stat_hash(key) == etag:
+        url = uploader.url_for(key)
+        print(f"云端已存在相同内容，跳过上传: {url}")
+        return url
+    return None
+
+
+# 视频编码档位：在编码速度与文件大小之间取舍
+ENCODER_PROFILES = {
+    # 原有行为：libx264 默认 preset（medium）与 crf（23）
+    "x264_default": {"codec": "libx264", "pix_fmt": "yuv420p"},
+    "x264_fast": {"codec": "libx264", "pix_fmt": "yuv420p", "preset": "veryfast", "crf": 23},
+    "x264_ultrafast": {"codec": "libx264", "pix_fmt": "yuv420p", "preset": "ultrafast", "crf": 23},
+    "x264_small": {"codec": "libx264", "pix_fmt": "yuv420p", "preset": "slow", "crf": 28},
+    # 无损中间格式：rgb24 直接编码，不做色彩空间转换，适合后续再加工
+    "x264_lossless": {"codec": "libx264rgb", "pix_fmt": "rgb24", "preset": "ultrafast", "crf": 0},
+    # mov 封装不支持 VP9，avi 中的 VP9 多数播放器无法识别，仅允许 mp4/mkv
+    "vp9_realtime": {
+        "codec": "libvpx-vp9", "pix_fmt": "yuv420p", "crf": 32, "containers": ("mp4", "mkv"),
+        "extra": ["-b:v", "0", "-deadline", "realtime", "-cpu-used", "8", "-row-mt", "1"],
+    },
+}
+
+# 各编码器 crf 上限（8 位 x264 为 51，VP9 为 63），超出时截断
+CODEC_CRF_MAX = {"libx264": 51, "libx264rgb": 51, "libvpx-vp9": 63}
+
+X264_PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"]
+X264_TUNES = ["film", "animation", "grain", "stillimage", "fastdecode", "zerolatency"]
+
+
+def _check_profile_container(profile: str, ext: str):
+    """编码档位与封装格式不兼容时在启动 ffmpeg 前报错，避免生成空文件"""
+    containers = ENCODER_PROFILES.get(profile, ENCODER_PROFILES["x264_default"]).get("containers")
+    if containers and ext not in containers:
+        raise ValueError(f"编码档位 {profile} 不支持 {ext} 封装，可选: {', '.join(containers)}")
+
+
+def _encoder_args(profile: str = "x264_default", crf: int = -1, preset: str = "profile", threads: int = 0,
+                  tune: str = "profile", x264_params: str = "") -> list:
+    """
+    根据编码档位生成 ffmpeg 输出编码参数。
+    crf 为 -1、preset/tune 为 "profile" 时使用档位默认值，超过编码器上限时截断；preset/tune/x264_params 仅对 libx264 生效。
+    """
+    config = ENCODER_PROFILES.get(profile, ENCODER_PROFILES["x264_default"])
+    codec = config["codec"]
+    is_x264 = codec.startswith("libx264")
+    args = ['-vcodec', codec, '-pix_fmt', config["pix_fmt"]]
+
+    preset = config.get("preset") if preset == "profile" else preset
+    if is_x264 and preset:
+        args += ['-preset', preset]
+    tune = config.get("tune") if tune == "profile" else tune
+    if is_x264 and tune and tune != "none":
+        args += ['-tune', tune]
+    crf = config.get("crf") if crf < 0 else crf
+    if crf is not None and crf > CODEC_CRF_MAX.get(codec, crf):
+        print(f"{codec} 的 crf 上限为 {CODEC_CRF_MAX[codec]}，已将 crf {crf} 截断")
+        crf = CODEC_CRF_MAX[codec]
+    if crf is not None:
+        args += ['-crf', str(crf)]
+    if is_x264 and x264_params.strip():
+        args += ['-x264-params', x264_params.strip()]
+    if threads > 0:
+        args += ['-threads', str(threads)]
+    return args + config.get("extra", [])
+
+
+def _remove_files(*paths):
+    """删除临时文件，不存在时忽略"""
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def _is_valid_audio(audio) -> bool:
+    """判断 AUDIO 输入是否包含有效（非空、非静音）的波形"""
+    if not (audio and isinstance(audio, dict) and "waveform" in audio and "sample_rate" in audio):
+        return False
+    waveform = audio["waveform"]
+    if not hasattr(waveform, 'numel') or waveform.numel() == 0:
+        return False
+    if waveform.abs().sum().item() == 0:
+        return False
+    return True
+
+
 class CloudImageUploadNode:
     """
     ComfyUI 图片张量直接上传云节点
@@ -87,42 +786,92 @@ class CloudImageUploadNode:
                 "images": ("IMAGE", ),
                 "folder": ("STRING", {"default": "output"}),
                 "key_prefix": ("STRING", {"default": "comfyui_"}),
-                "format": (["PNG", "JPEG", "GIF"], {"default": "PNG"}),
+                "format": (["PNG", "JPEG", "GIF", "WEBP"], {"default": "PNG"}),
+            },
+            "optional": {
+                # 同时编码+上传的图片数，1 为逐张串行
+                "concurrency": ("INT", {"default": 4, "min": 1, "max": 32}),
+                # 写入本地暂存目录后立即返回 URL，由后台队列完成上传
+                "async_upload": ("BOOLEAN", {"default": False}),
+                # 编码进程数：1 为在上传线程中编码（默认），0 为按 CPU 核数自动，大于 1 使用进程池
+                "encode_workers": ("INT", {"default": 1, "min": 0, "max": 64}),
+                "png_compress_level": ("INT", {"default": 6, "min": 0, "max": 9}),
+                "png_optimize": ("BOOLEAN", {"default": False}),
+                "jpeg_quality": ("INT", {"default": 75, "min": 1, "max": 100}),
+                "jpeg_progressive": ("BOOLEAN", {"default": False}),
+                "jpeg_subsampling": (list(JPEG_SUBSAMPLING), {"default": "4:2:0"}),
+                "webp_lossless": ("BOOLEAN", {"default": False}),
+                "webp_quality": ("INT", {"default": 80, "min": 1, "max": 100}),
+                "webp_method": ("INT", {"default": 4, "min": 0, "max": 6}),
+                # 内容寻址：以七牛 etag 作为文件名，已上传过的相同内容直接返回已有 URL
+                "dedup": ("BOOLEAN", {"default": False}),
+                # 本地索引未命中时再通过 stat 查询云端是否已存在
+                "dedup_stat": ("BOOLEAN", {"default": False}),
             }
         }
 
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("urls",)
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("urls", "errors")
     FUNCTION = "upload_images"
     CATEGORY = "云服务"
     OUTPUT_NODE = True
 
-    def upload_images(self, access_key, secret_key, bucket_name, domain, images, folder, key_prefix, format):
+    def upload_images(self, access_key, secret_key, bucket_name, domain, images, folder, key_prefix, format, concurrency=4, async_upload=False,
+                      encode_workers=1, png_compress_level=6, png_optimize=False, jpeg_quality=75, jpeg_progressive=False,
+                      jpeg_subsampling="4:2:0", webp_lossless=False, webp_quality=80, webp_method=4,
+                      dedup=False, dedup_stat=False):
         cloud_type, _ = load_cloud_config()
-        if cloud_type == "jdcloud":
-            # uploader = JDCloudUploader(access_key, secret_key, bucket_name, domain)
-            raise NotImplementedError(f"暂不支持的云类型: {cloud_type}")
-        else:
-            uploader = QiniuUploader(access_key, secret_key, bucket_name, domain)
-        urls = []
-        arr = images.cpu().numpy() if hasattr(images, 'cpu') else images
-        for idx, image in enumerate(arr):
-            img = Image.fromarray(np.clip(255. * image, 0, 255).astype(np.uint8))
-            buf = io.BytesIO()
-            if format == "GIF":
-                img = img.convert("P", palette=Image.ADAPTIVE)
-                img.save(buf, format="GIF")
+        uploader = get_uploader(cloud_type, access_key, secret_key, bucket_name, domain)
+        arr = _images_to_uint8(images)
+        spec = _upload_spec(cloud_type, access_key, secret_key, bucket_name, domain)
+        namespace = f"{cloud_type}:{bucket_name}"
+        options = _image_save_options(format, png_compress_level, png_optimize, jpeg_quality, jpeg_progressive,
+                                      jpeg_subsampling, webp_lossless, webp_quality, webp_method)
+        if encode_workers == 0:
+            encode_workers = os.cpu_count() or 1
+        encode_pool = _get_encode_pool(encode_workers) if len(arr) > 1 else None
+
+        def _upload_one(image):
+            # 编码交给进程池，当前线程等待期间其它线程可继续上传已编码的图片
+            if encode_pool is not None:
+                data = _encode_with_pool(encode_pool, image, format, options)
             else:
-                img.save(buf, format=format)
-            buf.seek(0)
-            random_name = uuid.uuid4().hex
-            # 拼接文件夹路径
-            folder_path = folder.strip().strip('/')
-            key = f"{folder_path}/{key_prefix}{random_name}.{format.lower()}"
-            url = uploader.upload_binary(buf.getvalue(), key)
+                data = _encode_image(image, format, options)
+            etag = None
+            if dedup:
+                etag = qiniu_etag(data)
+                key = _build_key(folder, key_prefix, format.lower(), etag)
+                url = _dedup_lookup(uploader, namespace, key, etag, dedup_stat)
+                if url is not None:
+                    return url
+            else:
+                key = _build_key(folder, key_prefix, format.lower())
+            if async_upload:
+                index = {"namespace": namespace, "etag": etag} if etag is not None else None
+                get_upload_queue(_uploader_from_spec).enqueue_bytes(spec, key, data, index)
+                return uploader.url_for(key)
+            url = uploader.upload_binary(data, key)
+            if etag is not None:
+                get_upload_index().put(namespace, key, etag, url, len(data))
             print(f"上传图片返回 url: {url}, 类型: {type(url)}")
-            urls.append(str(url))
-        return (urls,)
+            return str(url)
+
+        # 线程池流水线：一张图编码时其它图可同时上传，结果按输入顺序返回
+        if encode_pool is not None:
+            concurrency = max(concurrency, encode_workers)
+        urls = [""] * len(arr)
+        errors = [""] * len(arr)
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(arr) or 1))) as executor:
+            futures = [executor.submit(_upload_one, image) for image in arr]
+            for idx, future in enumerate(futures):
+                try:
+                    urls[idx] = future.result()
+                except Exception as e:
+                    errors[idx] = f"上传失败: {str(e)}"
+                    print(f"第 {idx} 张图片{errors[idx]}")
+        if errors and all(errors):
+            raise Exception(errors[0])
+        return (urls, errors)
 
 class CloudVideoUploadNode:
     """
@@ -141,6 +890,13 @@ class CloudVideoUploadNode:
                 "folder": ("STRING", {"default": "video"}),
                 "key_prefix": ("STRING", {"default": "comfyui_"}),
                 "ext": (["mp4", "mov", "avi", "mkv"], {"default": "mp4"}),
+            },
+            "optional": {
+                # 立即返回 URL，由后台队列直接读取原文件上传（上传完成前请勿删除或修改该文件）
+                "async_upload": ("BOOLEAN", {"default": False}),
+                # 内容寻址：以七牛 etag 作为文件名，已上传过的相同视频直接返回已有 URL
+                "dedup": ("BOOLEAN", {"default": False}),
+                "dedup_stat": ("BOOLEAN", {"default": False}),
             }
         }
 
@@ -150,21 +906,31 @@ class CloudVideoUploadNode:
     CATEGORY = "云服务"
     OUTPUT_NODE = True
 
-    def upload_video(self, access_key, secret_key, bucket_name, domain, video_path, folder, key_prefix, ext):
+    def upload_video(self, access_key, secret_key, bucket_name, domain, video_path, folder, key_prefix, ext, async_upload=False,
+                     dedup=False, dedup_stat=False):
         cloud_type, _ = load_cloud_config()
-        if cloud_type == "jdcloud":
-            # uploader = JDCloudUploader(access_key, secret_key, bucket_name, domain)
-            raise NotImplementedError(f"暂不支持的云类型: {cloud_type}")
-        else:
-            uploader = QiniuUploader(access_key, secret_key, bucket_name, domain)
+        uploader = get_uploader(cloud_type, access_key, secret_key, bucket_name, domain)
         if not os.path.isfile(video_path):
             raise FileNotFoundError(f"视频文件不存在: {video_path}")
-        with open(video_path, "rb") as f:
-            data = f.read()
-        random_name = uuid.uuid4().hex
-        folder_path = folder.strip().strip('/')
-        key = f"{folder_path}/{key_prefix}{random_name}.{ext}"
-        url = uploader.upload_binary(data, key)
+        namespace = f"{cloud_type}:{bucket_name}"
+        etag = None
+        if dedup:
+            etag = qiniu_etag_file(video_path)
+            key = _build_key(folder, key_prefix, ext, etag)
+            url = _dedup_lookup(uploader, namespace, key, etag, dedup_stat)
+            if url is not None:
+                return (url,)
+        else:
+            key = _build_key(folder, key_prefix, ext)
+        if async_upload:
+            spec = _upload_spec(cloud_type, access_key, secret_key, bucket_name, domain)
+            index = {"namespace": namespace, "etag": etag} if etag is not None else None
+            get_upload_queue(_uploader_from_spec).enqueue_file(spec, key, video_path, index=index)
+            return (uploader.url_for(key),)
+        # 大文件自动分片并行上传，不整体读入内存
+        url = uploader.upload_file(video_path, key)
+        if etag is not None:
+            get_upload_index().put(namespace, key, etag, url, os.path.getsize(video_path))
         print(f"上传视频返回 url: {url}, 类型: {type(url)}")
         return (url,)
 
@@ -190,6 +956,20 @@ class CloudImagesToVideoAndUpload:
                 "key_prefix": ("STRING", {"default": "comfyui_"}),
                 "ext": (["mp4", "mov", "avi", "mkv"], {"default": "mp4"}),
                 "audio": ("AUDIO", {"default": None}),  # 改为AUDIO类型
+            },
+            "optional": {
+                # ffmpeg 输出分片 MP4 到管道并直接分片上传，不落临时文件（avi 不支持，自动回退）
+                "streaming_upload": ("BOOLEAN", {"default": False}),
+                # 编码档位与覆盖参数：crf=-1、preset/tune=profile 时沿用档位默认值，threads=0 自动
+                "encoder_profile": (list(ENCODER_PROFILES), {"default": "x264_default"}),
+                # libx264 上限 51，libvpx-vp9 上限 63
+                "crf": ("INT", {"default": -1, "min": -1, "max": 63}),
+                "preset": (["profile"] + X264_PRESETS, {"default": "profile"}),
+                "threads": ("INT", {"default": 0, "min": 0, "max": 64}),
+                "tune": (["profile", "none"] + X264_TUNES, {"default": "profile"}),
+                "x264_params": ("STRING", {"default": ""}),
+                # 编码完成后将视频移入暂存目录并立即返回 URL，由后台队列上传（忽略 streaming_upload）
+                "async_upload": ("BOOLEAN", {"default": False}),
             }
         }
 
@@ -199,18 +979,51 @@ class CloudImagesToVideoAndUpload:
     CATEGORY = "云服务"
     OUTPUT_NODE = True
 
-    def images_to_video_and_upload(self, images, fps, cloud_type, access_key, secret_key, bucket_name, domain, folder, key_prefix, ext, audio=None):
-        config = load_cloud_config()[1]
-        access_key = access_key or config.get("access_key", "")
-        secret_key = secret_key or config.get("secret_key", "")
-        bucket_name = bucket_name or config.get("bucket_name", "")
-        domain = domain or config.get("domain", "")
-        # 1. 张量转图片序列
-        arr = images.cpu().numpy() if hasattr(images, 'cpu') else images
-        img_list = [Image.fromarray(np.clip(255. * img, 0, 255).astype(np.uint8)) for img in arr]
-        # 2. 合成视频
-        height, width = img_list[0].height, img_list[0].width
-        pix_fmt = 'rgb24'
+    # 可写入非可寻址管道的封装格式
+    STREAM_FORMATS = {"mp4": "mp4", "mov": "mov", "mkv": "matroska"}
+
+    # 每批转换的原始帧数据上限（字节），限制中间缓冲占用
+    FRAME_CHUNK_BYTES = 64 * 1024 * 1024
+
+    def _frame_bytes(self, images):
+        """
+        按批生成 rgb24 原始数据：每批帧一次性完成 clamp/缩放/转 uint8（张量在 GPU 上时先在设备端转换），
+        以 memoryview 形式交给管道写入，不经过 PIL，也不一次性物化整段视频。
+        """
+        import numpy as np
+        frames, height, width = images.shape[0], images.shape[1], images.shape[2]
+        chunk = max(1, self.FRAME_CHUNK_BYTES // (height * width * 3))
+        for start in range(0, frames, chunk):
+            batch = images[start:start + chunk]
+            # 与 RGB 转换保持一致：丢弃 alpha 通道
+            if batch.shape[-1] == 4:
+                batch = batch[..., :3]
+            if hasattr(batch, 'cpu'):
+                import torch
+                if batch.shape[-1] == 1:
+                    batch = batch.expand(-1, -1, -1, 3)
+                data = (batch * 255.).clamp_(0, 255).to(torch.uint8).cpu().contiguous().numpy()
+            else:
+                if batch.shape[-1] == 1:
+                    batch = np.repeat(batch, 3, axis=-1)
+                data = np.ascontiguousarray(np.clip(255. * batch, 0, 255).astype(np.uint8))
+            yield memoryview(data).cast('B')
+
+    def _video_input_args(self, images, fps):
+        """rawvideo 管道输入参数"""
+        height, width = images.shape[1], images.shape[2]
+        return [
+            '-f', 'rawvideo',
+            '-vcodec', 'rawvideo',
+            '-s', f'{width}x{height}',
+            '-pix_fmt', 'rgb24',
+            '-r', str(fps),
+            '-i', '-',
+        ]
+
+    def _encode_to_file(self, images, fps, ext, audio, encoder_args):
+        """原有流程：先生成无音频临时视频，有音频时再合成一次，返回临时文件路径"""
+        import imageio_ffmpeg
         with tempfile.NamedTemporaryFile(suffix=f'.{ext}', delete=False) as tmpfile:
             tmp_path = tmpfile.name
         # 先生成无音频视频，临时文件名用 _noaudio 结尾但扩展名标准
@@ -218,33 +1031,28 @@ class CloudImagesToVideoAndUpload:
         cmd = [
             imageio_ffmpeg.get_ffmpeg_exe(),
             '-y',
-            '-f', 'rawvideo',
-            '-vcodec', 'rawvideo',
-            '-s', f'{width}x{height}',
-            '-pix_fmt', pix_fmt,
-            '-r', str(fps),
-            '-i', '-',
+            *self._video_input_args(images, fps),
             '-an',
-            '-vcodec', 'libx264',
-            '-pix_fmt', 'yuv420p',
+            *encoder_args,
             tmp_video_path
         ]
         proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
-        for im in img_list:
-            proc.stdin.write(im.convert('RGB').tobytes())
-        proc.stdin.close()
-        proc.wait()
+        try:
+            for frame in self._frame_bytes(images):
+                proc.stdin.write(frame)
+        except BrokenPipeError:
+            # ffmpeg 提前退出，失败原因以返回码为准
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+        if proc.wait() != 0:
+            _remove_files(tmp_video_path, tmp_path)
+            raise RuntimeError(f"ffmpeg 编码失败，返回码 {proc.returncode}")
         # 如果有AUDIO，保存为wav临时文件再合成
-        def is_valid_audio(audio):
-            if not (audio and isinstance(audio, dict) and "waveform" in audio and "sample_rate" in audio):
-                return False
-            waveform = audio["waveform"]
-            if not hasattr(waveform, 'numel') or waveform.numel() == 0:
-                return False
-            if waveform.abs().sum().item() == 0:
-                return False
-            return True
-        if is_valid_audio(audio):
+        if audio is not None:
             with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_audio:
                 audio_path = tmp_audio.name
             waveform = audio["waveform"]
@@ -252,40 +1060,162 @@ class CloudImagesToVideoAndUpload:
             # waveform shape: (1, channels, samples) or (channels, samples)
             if waveform.dim() == 3:
                 waveform = waveform.squeeze(0)
-            import torchaudio
-            torchaudio.save(audio_path, waveform, sample_rate)
-            # 合成音视频到tmp_path
-            merge_cmd = [
-                imageio_ffmpeg.get_ffmpeg_exe(),
-                '-y',
-                '-i', tmp_video_path,
-                '-i', audio_path,
-                '-c:v', 'copy',
-                '-c:a', 'aac',
-                '-shortest',
-                tmp_path
-            ]
-            subprocess.run(merge_cmd, check=True)
-            os.remove(tmp_video_path)
-            os.remove(audio_path)
+            try:
+                import torchaudio
+                torchaudio.save(audio_path, waveform, sample_rate)
+                # 合成音视频到tmp_path
+                merge_cmd = [
+                    imageio_ffmpeg.get_ffmpeg_exe(),
+                    '-y',
+                    '-i', tmp_video_path,
+                    '-i', audio_path,
+                    '-c:v', 'copy',
+                    '-c:a', 'aac',
+                    '-shortest',
+                    tmp_path
+                ]
+                returncode = subprocess.run(merge_cmd).returncode
+            except Exception:
+                _remove_files(tmp_video_path, audio_path, tmp_path)
+                raise
+            _remove_files(tmp_video_path, audio_path)
+            if returncode != 0:
+                _remove_files(tmp_path)
+                raise RuntimeError(f"ffmpeg 音视频合成失败，返回码 {returncode}")
         else:
             # 无音频直接重命名
-            os.rename(tmp_video_path, tmp_path)
-        # 3. 上传到云存储
-        if cloud_type == "qiniu":
-            uploader = QiniuUploader(access_key, secret_key, bucket_name, domain)
-        elif cloud_type == "jdcloud":
-            # uploader = JDCloudUploader(access_key, secret_key, bucket_name, domain)
-            raise NotImplementedError(f"暂不支持的云类型: {cloud_type}")
-        random_name = uuid.uuid4().hex
-        folder_path = folder.strip().strip('/')
-        key = f"{folder_path}/{key_prefix}{random_name}.{ext}"
-        with open(tmp_path, "rb") as f:
-            data = f.read()
-        url = uploader.upload_binary(data, key)
-        os.remove(tmp_path)
+            os.replace(tmp_video_path, tmp_path)
+        return tmp_path
+
+    def _encode_streaming(self, images, fps, ext, audio, encoder_args, uploader, key):
+        """
+        单次 ffmpeg 调用完成编码与音频混流：
+        视频帧经 stdin 输入，音频以 f32le 原始采样经第二个管道输入（Windows 下退化为临时原始音频文件），
+        输出分片 MP4（frag_keyframe+empty_moov）到 stdout，并直接交给上传器分片上传。
+        """
+        import imageio_ffmpeg
+        cmd = [imageio_ffmpeg.get_ffmpeg_exe(), '-y', *self._video_input_args(images, fps)]
+
+        audio_bytes = None
+        audio_read_fd = audio_write_fd = None
+        audio_path = None
+        pass_fds = ()
+        if audio is not None:
+            waveform = audio["waveform"]
+            if waveform.dim() == 3:
+                waveform = waveform.squeeze(0)
+            channels = waveform.shape[0]
+            # (channels, samples) -> 交错的 (samples, channels) float32
+            audio_bytes = waveform.detach().cpu().float().t().contiguous().numpy().tobytes()
+            if os.name == "posix":
+                audio_read_fd, audio_write_fd = os.pipe()
+                pass_fds = (audio_read_fd,)
+                audio_source = f'pipe:{audio_read_fd}'
+            else:
+                with tempfile.NamedTemporaryFile(suffix='.f32le', delete=False) as tmp_audio:
+                    tmp_audio.write(audio_bytes)
+                    audio_path = tmp_audio.name
+                audio_source = audio_path
+            cmd += ['-f', 'f32le', '-ar', str(audio["sample_rate"]), '-ac', str(channels), '-i', audio_source]
+
+        cmd += encoder_args
+        if audio is not None:
+            cmd += ['-c:a', 'aac', '-shortest']
+        else:
+            cmd += ['-an']
+        if ext in ("mp4", "mov"):
+            cmd += ['-movflags', 'frag_keyframe+empty_moov']
+        cmd += ['-f', self.STREAM_FORMATS[ext], 'pipe:1']
+
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, pass_fds=pass_fds)
+        if audio_read_fd is not None:
+            os.close(audio_read_fd)
+
+        errors = []
+
+        def _write_video():
+            try:
+                for frame in self._frame_bytes(images):
+                    proc.stdin.write(frame)
+            except BrokenPipeError:
+                # -shortest 时音频先结束，ffmpeg 会提前关闭视频输入并正常退出；
+                # 是否编码成功以 ffmpeg 返回码为准
+                pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                try:
+                    proc.stdin.close()
+                except OSError:
+                    pass
+
+        def _write_audio():
+            try:
+                with os.fdopen(audio_write_fd, "wb") as f:
+                    f.write(audio_bytes)
+            except Exception as e:
+                # -shortest 时 ffmpeg 可能提前关闭音频管道
+                if not isinstance(e, BrokenPipeError):
+                    errors.append(e)
+
+        writers = [threading.Thread(target=_write_video, daemon=True)]
+        if audio_write_fd is not None:
+            writers.append(threading.Thread(target=_write_audio, daemon=True))
+        for t in writers:
+            t.start()
+
+        def _check_encoder():
+            # 流读取完毕后确认 ffmpeg 正常退出，否则放弃提交
+            for t in writers:
+                t.join()
+            if proc.wait() != 0:
+                raise RuntimeError(f"ffmpeg 编码失败，返回码 {proc.returncode}")
+            if errors:
+                raise errors[0]
+
+        try:
+            return uploader.upload_stream(proc.stdout, key, on_eof=_check_encoder)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+            proc.stdout.close()
+            if audio_path is not None:
+                os.remove(audio_path)
+
+    def images_to_video_and_upload(self, images, fps, cloud_type, access_key, secret_key, bucket_name, domain, folder, key_prefix, ext, audio=None, streaming_upload=False,
+                                   encoder_profile="x264_default", crf=-1, preset="profile", threads=0, tune="profile", x264_params="",
+                                   async_upload=False):
+        _check_profile_container(encoder_profile, ext)
+        config = load_cloud_config()[1]
+        access_key = access_key or config.get("access_key", "")
+        secret_key = secret_key or config.get("secret_key", "")
+        bucket_name = bucket_name or config.get("bucket_name", "")
+        domain = domain or config.get("domain", "")
+        uploader = get_uploader(cloud_type, access_key, secret_key, bucket_name, domain)
+        key = _build_key(folder, key_prefix, ext)
+        audio = audio if _is_valid_audio(audio) else None
+        encoder_args = _encoder_args(encoder_profile, crf, preset, threads, tune, x264_params)
+
+        if streaming_upload and not async_upload and ext in self.STREAM_FORMATS:
+            return (self._encode_streaming(images, fps, ext, audio, encoder_args, uploader, key),)
+
+        tmp_path = self._encode_to_file(images, fps, ext, audio, encoder_args)
+        if async_upload:
+            spec = _upload_spec(cloud_type, access_key, secret_key, bucket_name, domain)
+            get_upload_queue(_uploader_from_spec).enqueue_file(spec, key, tmp_path, move=True)
+            return (uploader.url_for(key),)
+        try:
+            url = uploader.upload_file(tmp_path, key)
+        finally:
+            os.remove(tmp_path)
         return (url,)
 
+register_routes()
+
+# 恢复上次进程退出时尚未完成的后台上传
+resume_pending(_uploader_from_spec)
+
 # 注册到节点映射
 NODE_CLASS_MAPPINGS = {
     "CloudImageUploadNode": CloudImageUploadNode,
@@ -1,8 +1,4 @@
-from PIL import Image, ImageOps
-from PIL.PngImagePlugin import PngInfo
-import requests
-import torch
-import numpy as np
+# PIL、torch、numpy 在节点执行时才导入，避免拖慢 ComfyUI 启动
 
 class LoadImgFromUrl:
     """Load an image from the given URL"""
@@ -26,6 +22,10 @@ class LoadImgFromUrl:
     CATEGORY = "云服务"
     
     def load(self, url):
+        import requests
+        import torch
+        import numpy as np
+        from PIL import Image, ImageOps
         response = requests.get(url, stream=True, timeout=10)
         response.raise_for_status()
         image = Image.open(response.raw)
@@ -60,6 +60,9 @@ class LoadGifFromLocal:
     CATEGORY = "本地文件"
 
     def load(self, path):
+        import torch
+        import numpy as np
+        from PIL import Image, ImageOps
         images = []
         with Image.open(path) as im:
             for frame in range(im.n_frames):
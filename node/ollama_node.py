@@ -1,11 +1,20 @@
 import requests
 import json
+import asyncio
 import logging
 import re
 import os
 import threading
+import time
 from threading import Lock
 from typing import Optional, List, Union, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ..llm_cache import get_llm_cache, make_cache_key
+from ..llm_stream import StreamBuffer
+from ..ollama_utils import (
+    get_ollama_url, get_endpoint_semaphore, get_session, get_timeouts, OllamaContext,
+    get_models_ttl, parse_keep_alive, record_latency, get_latency_stats, list_running_models, preload_model, start_preload_from_env,
+)
 
 # ----------------------------
 # 日志系统配置
@@ -35,9 +44,9 @@ class ComfyUI_LLM_Ollama:
     Ollama LLM集成节点
     
     特性：
-    - 支持流式响应生成
+    - 支持流式响应生成（实时推送到前端）
     - 上下文记忆管理
-    - 多线程安全访问
+    - 按服务地址限流的并发访问
     - 动态模型列表加载
     - 详细的日志记录
     """
@@ -46,9 +55,9 @@ class ComfyUI_LLM_Ollama:
     
     # 类级共享状态
     _conn_lock = Lock()
-    _api_lock = Lock()
-    _connection_checked = False
+    _refreshing = False
     _connection_status = False
+    _models_updated_at = 0.0
     _available_models = ["llama3", "deepseek-r1:7b"]  # 默认值
     
     # 类级日志器 ✅ 修正点1
@@ -57,9 +66,8 @@ class ComfyUI_LLM_Ollama:
     @classmethod
     def INPUT_TYPES(cls):
         """动态生成输入配置"""
-        # 在类加载时尝试获取可用模型
-        if not cls._connection_checked:
-            cls._check_connection()
+        # 模型列表过期时后台刷新，立即返回当前缓存，不阻塞节点注册
+        cls._schedule_refresh()
         
         return {
             "required": {
@@ -98,19 +106,28 @@ class ComfyUI_LLM_Ollama:
                     "default": "",
                     "lazy": True
                 }),
+                "use_cache": ("BOOLEAN", {"default": False}),
+                # json: 旧版 STRING 上下文；native: OLLAMA_CONTEXT 引用传递；chat: /api/chat 复用服务端 KV 缓存
+                "context_mode": (["json", "native", "chat"], {"default": "json"}),
+                "kv_context": ("OLLAMA_CONTEXT", {"forceInput": True}),
+                "keep_alive": ("STRING", {"default": "5m"}),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
             }
         }
 
-    RETURN_TYPES = ("STRING", "STRING")
-    RETURN_NAMES = ("response", "context")
+    RETURN_TYPES = ("STRING", "STRING", "OLLAMA_CONTEXT")
+    RETURN_NAMES = ("response", "context", "kv_context")
     FUNCTION = "generate"
     CATEGORY = "LLM"
     OUTPUT_NODE = False
 
     def __init__(self):
-        self.ollama_url = "http://localhost:11434"
+        self.ollama_url = get_ollama_url()
         self.headers = {"Content-Type": "application/json"}
-        self.timeout = 120
+        self.timeout = get_timeouts()
+        self.session = get_session(self.ollama_url)
         self._init_logging()  # ✅ 修正点2：实例初始化日志配置
 
     def _init_logging(self):
@@ -125,46 +142,97 @@ class ComfyUI_LLM_Ollama:
         self.logger.setLevel(logging.INFO)
 
     @classmethod
-    def _check_connection(cls):
-        """类方法使用类级日志器 ✅ 修正点3"""
-        with cls._conn_lock:
-            if not cls._connection_checked:
-                try:
-                    # 使用类级日志器
-                    cls.logger.info(f"🛠 正在检查Ollama连接...")
-                    
-                    response = requests.get(
-                        "http://localhost:11434/api/tags",
-                        timeout=10
-                    )
-                    if response.status_code == 200:
-                        models = response.json().get("models", [])
-                        cls._available_models = [m["name"] for m in models]
-                        cls._connection_status = True
-                        cls.logger.info(f"✅ 可用模型: {cls._available_models}")
-                    else:
-                        cls.logger.warning(f"连接失败，状态码：{response.status_code}")
-                except Exception as e:
-                    cls.logger.error(f"连接异常：{str(e)}")
-                finally:
-                    cls._connection_checked = True
+    def _refresh_models(cls) -> bool:
+        """
+        同步刷新模型列表（/api/tags），返回服务是否可用。
+        状态保存在 ComfyUI_LLM_Ollama 上，子类共享。
+        """
+        base = ComfyUI_LLM_Ollama
+        status = False
+        try:
+            # 使用类级日志器
+            cls.logger.info(f"🛠 正在检查Ollama连接...")
+
+            ollama_url = get_ollama_url()
+            response = get_session(ollama_url).get(
+                f"{ollama_url}/api/tags",
+                timeout=get_timeouts()
+            )
+            if response.status_code == 200:
+                models = response.json().get("models", [])
+                base._available_models = [m["name"] for m in models]
+                status = True
+                cls.logger.info(f"✅ 可用模型: {base._available_models}")
+            else:
+                cls.logger.warning(f"连接失败，状态码：{response.status_code}")
+        except Exception as e:
+            cls.logger.error(f"连接异常：{str(e)}")
+        finally:
+            with base._conn_lock:
+                base._connection_status = status
+                base._models_updated_at = time.monotonic()
+        return status
+
+    @classmethod
+    def _schedule_refresh(cls, force: bool = False):
+        """模型列表超过 TTL（服务不可用时缩短为 10 秒）或 force 时，启动后台线程刷新"""
+        base = ComfyUI_LLM_Ollama
+        ttl = get_models_ttl() if base._connection_status else min(10, get_models_ttl())
+        with base._conn_lock:
+            if base._refreshing:
+                return
+            if not force and base._models_updated_at and time.monotonic() - base._models_updated_at < ttl:
+                return
+            base._refreshing = True
+
+        def _worker():
+            try:
+                cls._refresh_models()
+            finally:
+                base._refreshing = False
+
+        threading.Thread(target=_worker, name="ollama-model-refresh", daemon=True).start()
+
+    def _ensure_connection(self) -> bool:
+        """服务此前不可用时重新探测一次，而不是永久返回不可用"""
+        return self._connection_status or self._refresh_models()
 
     def _build_payload(self, **kwargs):
         """构造API请求负载"""
         stop_sequences = [s.strip() for s in kwargs['stop_sequences'].split(',')] if kwargs['stop_sequences'] else []
-        
-        return {
-            "model": kwargs['model'],
-            "prompt": kwargs['prompt'],
-            "system": kwargs.get('system_message', '你是有帮助的AI助手'),
-            "context": self._parse_context(kwargs.get('context')),
-            "options": {
-                "temperature": kwargs['temperature'],
-                "num_predict": kwargs['max_tokens'],
-                "stop": stop_sequences,
-            }
+        context_mode = kwargs.get('context_mode', 'json')
+        kv_context = kwargs.get('kv_context')
+        system = kwargs.get('system_message', '你是有帮助的AI助手')
+        options = {
+            "temperature": kwargs['temperature'],
+            "num_predict": kwargs['max_tokens'],
+            "stop": stop_sequences,
         }
 
+        if context_mode == "chat":
+            # 对话历史前缀不变时，Ollama 可直接复用驻留模型的 KV 缓存，无需重新预填充
+            messages = [{"role": "system", "content": system}] if system else []
+            if kv_context is not None:
+                messages.extend(kv_context.messages)
+            messages.append({"role": "user", "content": kwargs['prompt']})
+            payload = {"model": kwargs['model'], "messages": messages, "options": options}
+        else:
+            if context_mode == "native":
+                context = kv_context.tokens.tolist() if kv_context is not None else []
+            else:
+                context = self._parse_context(kwargs.get('context'))
+            payload = {
+                "model": kwargs['model'],
+                "prompt": kwargs['prompt'],
+                "system": system,
+                "context": context,
+                "options": options,
+            }
+
+        if kwargs.get('keep_alive'):
+            payload["keep_alive"] = parse_keep_alive(kwargs['keep_alive'])
+        return payload
+
     def _parse_context(self, context: Optional[str]) -> List:
         """解析上下文数据"""
         try:
@@ -179,53 +247,323 @@ class ComfyUI_LLM_Ollama:
             return re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL).strip()
         return text.strip()
 
-    def generate(self, **kwargs):
-        """主执行方法"""
-        if not self._connection_status:
-            return ("Ollama服务不可用，请检查", "")
-            
-        with self._api_lock:
+    def _request_generate(self, payload: Dict[str, Any], node_id=None):
+        """
+        发送一次生成请求（受服务地址并发信号量约束）
+        负载包含 messages 时走 /api/chat，否则走 /api/generate
+        :param node_id: 节点 UNIQUE_ID，传入时将增量文本实时推送到前端
+        :return: (原始响应文本, 上下文token列表)，请求失败时抛出异常
+        """
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"请求参数：{json.dumps(payload, indent=2)}")
+
+        is_chat = "messages" in payload
+        endpoint = "/api/chat" if is_chat else "/api/generate"
+
+        # 按服务地址限流：同一 Ollama 服务最多 N 个请求同时进行
+        with get_endpoint_semaphore(self.ollama_url):
+            buffer = StreamBuffer(node_id)
+            context = []
+            load_duration = 0
+            start = time.perf_counter()
+
             try:
-                payload = self._build_payload(**kwargs)
-                self.logger.debug(f"请求参数：{json.dumps(payload, indent=2)}")
-                
-                response_text = ""
-                context = []
-                
-                with requests.post(
-                    f"{self.ollama_url}/api/generate",
+                with self.session.post(
+                    f"{self.ollama_url}{endpoint}",
                     json=payload,
                     headers=self.headers,
                     stream=True,
                     timeout=self.timeout
                 ) as response:
                     response.raise_for_status()
-                    
+
                     for line in response.iter_lines():
                         if line:
                             data = json.loads(line.decode('utf-8'))
-                            response_text += data.get("response", "")
+                            if is_chat:
+                                buffer.append(data.get("message", {}).get("content", ""))
+                            else:
+                                buffer.append(data.get("response", ""))
                             if data.get("done"):
                                 context = data.get("context", [])
-                
-                cleaned_response = self._clean_response(response_text, kwargs['hide_thoughts'])
-                self.logger.info(f"📥 响应长度: {len(cleaned_response)}字符")
-                return (cleaned_response, json.dumps(context))
-                
-            except requests.RequestException as e:
-                error_msg = f"API请求失败: {str(e)}"
-                self.logger.error(error_msg)
-                return (error_msg, "")
+                                load_duration = data.get("load_duration", 0) or 0
+            finally:
+                buffer.close()
+
+            record_latency(payload["model"], time.perf_counter() - start, load_duration)
+
+        return buffer.getvalue(), context
+
+    def _cached_generate(self, payload: Dict[str, Any], use_cache: bool = False, node_id=None):
+        """带响应缓存的生成请求，缓存键由服务地址与完整请求负载计算"""
+        if not use_cache:
+            return self._request_generate(payload, node_id)
+
+        cache = get_llm_cache()
+        # keep_alive 只影响模型驻留时长，不参与缓存键
+        request = {k: v for k, v in payload.items() if k != "keep_alive"}
+        key = make_cache_key("ollama", {"url": self.ollama_url, "payload": request})
+        cached = cache.get(key)
+        if cached is not None:
+            self.logger.info("⚡ 命中响应缓存")
+            buffer = StreamBuffer(node_id)
+            buffer.append(cached["response"])
+            buffer.close()
+            return cached["response"], cached["context"]
+
+        response_text, context = self._request_generate(payload, node_id)
+        cache.put(key, {"response": response_text, "context": context})
+        return response_text, context
+
+    def _build_context(self, payload: Dict[str, Any], response_text: str, context: List) -> OllamaContext:
+        """根据本轮请求与响应构造新的上下文对象"""
+        if "messages" in payload:
+            history = [m for m in payload["messages"] if m["role"] != "system"]
+            history.append({"role": "assistant", "content": response_text})
+            return OllamaContext(messages=history, model=payload["model"])
+        return OllamaContext(tokens=context, model=payload["model"])
+
+    def generate(self, **kwargs):
+        """主执行方法"""
+        if not self._ensure_connection():
+            return ("Ollama服务不可用，请检查", "", None)
+
+        try:
+            payload = self._build_payload(**kwargs)
+            response_text, context = self._cached_generate(
+                payload, kwargs.get('use_cache', False), kwargs.get('unique_id')
+            )
+
+            cleaned_response = self._clean_response(response_text, kwargs['hide_thoughts'])
+            self.logger.info(f"📥 响应长度: {len(cleaned_response)}字符")
+            kv_context = self._build_context(payload, response_text, context)
+            # 仅旧版 json 模式输出 STRING 上下文，其它模式跳过大数组的序列化
+            context_str = json.dumps(context) if kwargs.get('context_mode', 'json') == 'json' else ""
+            return (cleaned_response, context_str, kv_context)
+
+        except requests.RequestException as e:
+            error_msg = f"API请求失败: {str(e)}"
+            self.logger.error(error_msg)
+            if isinstance(e, requests.ConnectionError):
+                # 服务掉线，下次执行时重新探测
+                ComfyUI_LLM_Ollama._connection_status = False
+            return (error_msg, "", None)
+        except Exception as e:
+            error_msg = f"处理错误: {str(e)}"
+            self.logger.exception(error_msg)
+            return (error_msg, "", None)
+
+
+class ComfyUI_LLM_Ollama_Batch(ComfyUI_LLM_Ollama):
+    """
+    Ollama 批量生成节点
+
+    输入 LIST_STR（如 StringArrayFormatter 的输出），共享同一组系统提示与参数，
+    并发请求 Ollama 后按输入顺序返回结果，替代 forLoop + 索引器的逐条串行生成。
+    单条失败不影响其它条目，错误信息写入 errors 对应位置。
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        base = super().INPUT_TYPES()
+        required = dict(base["required"])
+        required.pop("prompt")
+        return {
+            "required": {
+                "prompts": ("LIST_STR", {"forceInput": True}),
+                **required,
+            },
+            "optional": {
+                "system_message": base["optional"]["system_message"],
+                "stop_sequences": base["optional"]["stop_sequences"],
+                "use_cache": base["optional"]["use_cache"],
+                "keep_alive": base["optional"]["keep_alive"],
+                # 本批次最大并发：0 为服务地址并发上限，超过上限时按上限执行
+                "max_concurrency": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 64,
+                    "step": 1,
+                    "display": "number"
+                }),
+            }
+        }
+
+    RETURN_TYPES = ("LIST_STR", "LIST_STR", "INT")
+    RETURN_NAMES = ("responses", "errors", "failed")
+    FUNCTION = "generate_batch"
+
+    def _generate_item(self, prompt: str, **kwargs) -> str:
+        """生成单条结果，异常向上抛出由调用方记录到错误槽位"""
+        payload = self._build_payload(prompt=prompt, **kwargs)
+        response_text, _ = self._cached_generate(payload, kwargs.get('use_cache', False))
+        return self._clean_response(response_text, kwargs['hide_thoughts'])
+
+    def generate_batch(self, prompts, max_concurrency=0, **kwargs):
+        """批量执行方法"""
+        prompts = [str(p) for p in (prompts or [])]
+        if not prompts:
+            return ([], [], 0)
+
+        if not self._ensure_connection():
+            error_msg = "Ollama服务不可用，请检查"
+            return ([""] * len(prompts), [error_msg] * len(prompts), len(prompts))
+
+        kwargs.setdefault("stop_sequences", "")
+        kwargs.pop("context", None)
+
+        # 本批次并发只在本地限制，不修改共享的服务地址并发上限
+        # （上限由 COMFYUI_OLLAMA_MAX_PARALLEL / OLLAMA_NUM_PARALLEL 配置，均未设置时为 1）
+        limit = get_endpoint_semaphore(self.ollama_url).limit
+        if max_concurrency > limit:
+            self.logger.warning(f"max_concurrency={max_concurrency} 超过服务地址并发上限 {limit}，"
+                                f"按 {limit} 执行；如需更高并发请设置 COMFYUI_OLLAMA_MAX_PARALLEL")
+        workers = max(1, min(max_concurrency or limit, limit, len(prompts)))
+        self.logger.info(f"📤 批量生成 {len(prompts)} 条，实际并发 {workers}（服务地址并发上限 {limit}）")
+
+        responses = [""] * len(prompts)
+        errors = [""] * len(prompts)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ollama-batch") as executor:
+            futures = {
+                executor.submit(self._generate_item, prompt, **kwargs): idx
+                for idx, prompt in enumerate(prompts)
+            }
+            for future in as_completed(futures):
+                idx = futures[future]
+                try:
+                    responses[idx] = future.result()
+                except requests.RequestException as e:
+                    errors[idx] = f"API请求失败: {str(e)}"
+                    self.logger.error(f"[{idx}] {errors[idx]}")
+                except Exception as e:
+                    errors[idx] = f"处理错误: {str(e)}"
+                    self.logger.exception(f"[{idx}] {errors[idx]}")
+
+        failed = sum(1 for e in errors if e)
+        self.logger.info(f"📥 批量生成完成: {len(prompts) - failed}/{len(prompts)} 成功")
+        return (responses, errors, failed)
+
+class OllamaModelWarmup:
+    """
+    Ollama 模型预热节点
+
+    - 预加载选定模型（空 prompt 生成 + keep_alive），避免首个生成请求承担模型加载耗时
+    - pin 为 True 时以 keep_alive=-1 常驻
+    - 输出 /api/ps 驻留模型列表与冷/热启动耗时统计
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "models": ("STRING", {"default": "deepseek-r1:7b"}),
+                "keep_alive": ("STRING", {"default": "30m"}),
+                "pin": ("BOOLEAN", {"default": False}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("report",)
+    FUNCTION = "warmup"
+    CATEGORY = "LLM"
+    OUTPUT_NODE = True
+
+    logger = logging.getLogger("ComfyUI-Ollama")
+
+    def warmup(self, models, keep_alive, pin):
+        ollama_url = get_ollama_url()
+        keep_alive = -1 if pin else parse_keep_alive(keep_alive)
+        lines = []
+
+        # 已驻留的模型跳过预热
+        try:
+            resident = {m.get("name") for m in list_running_models(ollama_url)}
+        except Exception as e:
+            self.logger.warning(f"查询驻留模型失败：{str(e)}")
+            resident = set()
+
+        for model in [m.strip() for m in models.split(",") if m.strip()]:
+            if model in resident and not pin:
+                lines.append(f"✅ {model}: 已驻留")
+                continue
+            try:
+                result = preload_model(ollama_url, model, keep_alive)
+                state = "冷启动" if result["cold"] else "热启动"
+                lines.append(f"🔥 {model}: {state} {result['seconds']:.2f}s（加载 {result['load_seconds']:.2f}s）")
             except Exception as e:
-                error_msg = f"处理错误: {str(e)}"
-                self.logger.exception(error_msg)
-                return (error_msg, "")
+                lines.append(f"❌ {model}: 预热失败 {str(e)}")
+
+        try:
+            running = list_running_models(ollama_url)
+            lines.append("驻留模型: " + (", ".join(f"{m.get('name')}（至 {m.get('expires_at', '-')}）" for m in running) or "无"))
+        except Exception as e:
+            lines.append(f"驻留模型查询失败: {str(e)}")
+
+        for model, kinds in get_latency_stats().items():
+            for kind, s in kinds.items():
+                lines.append(
+                    f"📊 {model} {kind}: {s['count']}次 平均 {s['avg']:.2f}s 最小 {s['min']:.2f}s 最大 {s['max']:.2f}s"
+                )
+
+        report = "\n".join(lines)
+        self.logger.info(report)
+        return (report,)
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        """每次执行都重新检查驻留状态"""
+        return float("nan")
+
+
+def _register_routes():
+    """
+    注册手动刷新接口：
+    GET  /comfyui_llm/ollama/models   返回当前缓存的模型列表与服务状态
+    POST /comfyui_llm/ollama/refresh  立即刷新模型列表
+    """
+    try:
+        from server import PromptServer
+        from aiohttp import web
+    except ImportError:
+        return
+
+    routes = PromptServer.instance.routes
+
+    def _status():
+        return {
+            "available": ComfyUI_LLM_Ollama._connection_status,
+            "models": ComfyUI_LLM_Ollama._available_models,
+            "latency": get_latency_stats(),
+        }
+
+    @routes.get("/comfyui_llm/ollama/models")
+    async def get_models(request):
+        return web.json_response(_status())
+
+    @routes.post("/comfyui_llm/ollama/refresh")
+    async def refresh_models(request):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, ComfyUI_LLM_Ollama._refresh_models)
+        return web.json_response(_status())
+
+
+_register_routes()
+
+# 导入时即在后台发现模型，首次打开前端时模型列表通常已就绪
+ComfyUI_LLM_Ollama._schedule_refresh()
+
+# 启动时按环境变量在后台预热模型
+start_preload_from_env()
 
 # 节点注册
 NODE_CLASS_MAPPINGS = {
-    "ComfyUI_LLM_Ollama": ComfyUI_LLM_Ollama
+    "ComfyUI_LLM_Ollama": ComfyUI_LLM_Ollama,
+    "ComfyUI_LLM_Ollama_Batch": ComfyUI_LLM_Ollama_Batch,
+    "OllamaModelWarmup": OllamaModelWarmup
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
-    "ComfyUI_LLM_Ollama": "🤖 Ollama LLM"
-}
\ No newline at end of file
+    "ComfyUI_LLM_Ollama": "🤖 Ollama LLM",
+    "ComfyUI_LLM_Ollama_Batch": "🤖 Ollama 批量生成",
+    "OllamaModelWarmup": "🔥 Ollama 模型预热"
+}
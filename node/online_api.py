@@ -1,9 +1,13 @@
 import os
 import json
+import time
+import asyncio
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List
-from openai import OpenAI, Stream
-from openai.types.chat import ChatCompletionChunk
+from ..llm_cache import get_llm_cache, make_cache_key
+from ..llm_stream import StreamBuffer
 
 # ----------------------------
 # 日志系统配置
@@ -20,6 +24,86 @@ logging.basicConfig(
 logger = logging.getLogger("ComfyUI-DeepSeek")
 logger.addHandler(logging.StreamHandler())
 
+DEFAULT_BASE_URL = "https://api.deepseek.com/v1"
+
+# (api_key, base_url) -> OpenAI 客户端，复用其底层 httpx 连接池与 keep-alive 连接
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_openai_client(api_key: str, base_url: str = DEFAULT_BASE_URL):
+    """获取共享的 OpenAI 兼容客户端，同一 (api_key, base_url) 只创建一次"""
+    from openai import OpenAI
+    key = (api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(api_key=api_key, base_url=base_url)
+            _clients[key] = client
+        return client
+
+
+def _run_coroutine(coro):
+    """
+    在同步节点中执行协程。
+    当前线程已有运行中的事件循环（新版 ComfyUI 执行器）时，转到独立线程执行。
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+class _AsyncRateLimiter:
+    """
+    异步令牌桶限流器，同时限制每分钟请求数与每分钟 token 数，0 表示不限制。
+    token 数按预估值预扣，响应返回后按实际用量修正。
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens: int):
+        """等待直到额度足够，再扣除一次请求与 tokens 个 token"""
+        tokens = min(tokens, self.tpm) if self.tpm else tokens
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = 0.0
+                if self.rpm and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.rpm)
+                if self.tpm and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tpm)
+                if wait <= 0:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= tokens
+                    return
+                await asyncio.sleep(wait)
+
+    def refund(self, tokens: int):
+        """按实际用量退还（或补扣）预估的 token 额度"""
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + tokens)
+
+
 class ComfyUI_LLM_Online:
     
     @classmethod
@@ -37,6 +121,13 @@ class ComfyUI_LLM_Online:
             "optional": {
                 "system_prompt": ("STRING", {"default": "你是有帮助的AI助手", "multiline": True}),
                 "context": ("STRING", {"default": ""}),
+                "use_cache": ("BOOLEAN", {"default": False}),
+                # 任意 OpenAI 兼容接口（含本地服务），custom_model 非空时覆盖 model
+                "base_url": ("STRING", {"default": DEFAULT_BASE_URL}),
+                "custom_model": ("STRING", {"default": ""}),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
             }
         }
 
@@ -79,49 +170,77 @@ class ComfyUI_LLM_Online:
         messages.append({"role": "user", "content": kwargs["input_str"]})
         return messages
 
-    def _handle_stream_response(self, stream: Stream[ChatCompletionChunk]) -> str:
-        """处理流式响应"""
-        full_response = []
-        for chunk in stream:
-            if content := chunk.choices[0].delta.content:
-                full_response.append(content)
-                yield content  # 实时输出
-        
-        logger.debug(f"完整响应：{''.join(full_response)}")
-        return ''.join(full_response)
+    def _handle_stream_response(self, stream: "Stream[ChatCompletionChunk]", node_id=None) -> str:
+        """处理流式响应：增量推送到前端，结束后拼接为完整文本"""
+        buffer = StreamBuffer(node_id)
+        try:
+            for chunk in stream:
+                if chunk.choices and (content := chunk.choices[0].delta.content):
+                    buffer.append(content)  # 实时输出
+        finally:
+            buffer.close()
+
+        full_response = buffer.getvalue()
+        logger.debug(f"完整响应：{full_response}")
+        return full_response
+
+    def _build_request(self, **kwargs) -> dict:
+        """构造 chat.completions 请求参数"""
+        stop_sequences = [s.strip() for s in kwargs["stop_sequences"].split(",") if s.strip()]
+        return {
+            "model": kwargs.get("custom_model", "").strip() or kwargs["model"],
+            "messages": self._build_messages(**kwargs),
+            "temperature": kwargs["temperature"],
+            "max_tokens": kwargs["max_tokens"],
+            "stop": stop_sequences if stop_sequences else None,
+        }
+
+    def _cache_key(self, base_url: str, request: dict) -> str:
+        """响应缓存键（不含 api_key）"""
+        return make_cache_key("deepseek", {"base_url": base_url, "request": request})
 
     def query_llm(self, **kwargs):
+        # openai 在节点执行时才导入，避免拖慢 ComfyUI 启动
+        from openai import Stream
         try:
             # 输入验证
             self._validate_inputs(**kwargs)
             
-            # 初始化客户端
-            client = OpenAI(
-                api_key=kwargs["api_key"],
-                base_url="https://api.deepseek.com/v1",
-            )
+            # 复用客户端连接池
+            base_url = (kwargs.get("base_url") or DEFAULT_BASE_URL).strip().rstrip("/")
+            client = get_openai_client(kwargs["api_key"], base_url)
             
             # 构造请求参数
-            stop_sequences = [s.strip() for s in kwargs["stop_sequences"].split(",") if s.strip()]
+            request = self._build_request(**kwargs)
+
+            # 响应缓存
+            cache_key = None
+            if kwargs.get("use_cache"):
+                cache_key = self._cache_key(base_url, request)
+                cached = get_llm_cache().get(cache_key)
+                if cached is not None:
+                    logger.info("命中响应缓存")
+                    buffer = StreamBuffer(kwargs.get("unique_id"))
+                    buffer.append(cached)
+                    buffer.close()
+                    return (cached,)
             
             # 创建API请求
             response = client.chat.completions.create(
-                model=kwargs["model"],
-                messages=self._build_messages(**kwargs),
-                temperature=kwargs["temperature"],
-                max_tokens=kwargs["max_tokens"],
-                stop=stop_sequences if stop_sequences else None,
+                **request,
                 stream=kwargs["stream_mode"] == "enable",
             )
             
             # 处理响应
             if isinstance(response, Stream):
                 # 流式处理
-                return (self._handle_stream_response(response),)
-            
-            # 普通响应
-            content = response.choices[0].message.content
-            logger.debug(f"API响应：{content}")
+                content = self._handle_stream_response(response, kwargs.get("unique_id"))
+            else:
+                # 普通响应
+                content = response.choices[0].message.content
+                logger.debug(f"API响应：{content}")
+            if cache_key is not None:
+                get_llm_cache().put(cache_key, content)
             return (content,)
             
         except Exception as e:
@@ -133,11 +252,106 @@ class ComfyUI_LLM_Online:
         """通过哈希值检测输入变化"""
         return hash(json.dumps(kwargs, sort_keys=True))
 
+class ComfyUI_LLM_Online_Batch(ComfyUI_LLM_Online):
+    """
+    OpenAI 兼容接口批量请求节点
+
+    基于 AsyncOpenAI 并发发送 LIST_STR 中的提示词，按每分钟请求数 / token 数限流，
+    结果按输入顺序返回，单条失败写入 errors 对应位置。
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        base = super().INPUT_TYPES()
+        required = dict(base["required"])
+        required.pop("input_str")
+        required.pop("stream_mode")
+        return {
+            "required": {
+                "prompts": ("LIST_STR", {"forceInput": True}),
+                **required,
+            },
+            "optional": {
+                "system_prompt": base["optional"]["system_prompt"],
+                "use_cache": base["optional"]["use_cache"],
+                "base_url": base["optional"]["base_url"],
+                "custom_model": base["optional"]["custom_model"],
+                "max_concurrency": ("INT", {"default": 8, "min": 1, "max": 64}),
+                "requests_per_minute": ("INT", {"default": 0, "min": 0, "max": 100000}),
+                "tokens_per_minute": ("INT", {"default": 0, "min": 0, "max": 10000000}),
+            }
+        }
+
+    RETURN_TYPES = ("LIST_STR", "LIST_STR", "INT")
+    RETURN_NAMES = ("responses", "errors", "failed")
+    FUNCTION = "query_batch"
+    OUTPUT_NODE = False
+
+    async def _query_all(self, prompts, base_url, max_concurrency, requests_per_minute, tokens_per_minute, **kwargs):
+        """并发请求所有提示词"""
+        from openai import AsyncOpenAI
+
+        limiter = _AsyncRateLimiter(requests_per_minute, tokens_per_minute)
+        responses = [""] * len(prompts)
+        errors = [""] * len(prompts)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        cache = get_llm_cache() if kwargs.get("use_cache") else None
+
+        async with AsyncOpenAI(api_key=kwargs["api_key"], base_url=base_url) as client:
+            async def _query_one(idx, prompt):
+                try:
+                    request = self._build_request(input_str=prompt, **kwargs)
+                    cache_key = None
+                    if cache is not None:
+                        cache_key = self._cache_key(base_url, request)
+                        cached = cache.get(cache_key)
+                        if cached is not None:
+                            responses[idx] = cached
+                            return
+
+                    # 预估 token：输入按字符数粗略估计 + 最大输出长度
+                    estimate = sum(len(m["content"]) for m in request["messages"]) + request["max_tokens"]
+                    async with semaphore:
+                        await limiter.acquire(estimate)
+                        response = await client.chat.completions.create(**request)
+                    if response.usage is not None:
+                        limiter.refund(estimate - response.usage.total_tokens)
+
+                    content = response.choices[0].message.content
+                    responses[idx] = content
+                    if cache_key is not None:
+                        cache.put(cache_key, content)
+                except Exception as e:
+                    errors[idx] = f"错误：{str(e)}"
+                    logger.error(f"[{idx}] API请求失败：{str(e)}")
+
+            await asyncio.gather(*(_query_one(idx, prompt) for idx, prompt in enumerate(prompts)))
+
+        return responses, errors
+
+    def query_batch(self, prompts, max_concurrency=8, requests_per_minute=0, tokens_per_minute=0, **kwargs):
+        prompts = [str(p) for p in (prompts or [])]
+        if not prompts:
+            return ([], [], 0)
+        if not kwargs.get("api_key"):
+            return ([""] * len(prompts), ["错误：API密钥不能为空"] * len(prompts), len(prompts))
+
+        base_url = (kwargs.get("base_url") or DEFAULT_BASE_URL).strip().rstrip("/")
+        responses, errors = _run_coroutine(
+            self._query_all(prompts, base_url, max_concurrency, requests_per_minute, tokens_per_minute, **kwargs)
+        )
+
+        failed = sum(1 for e in errors if e)
+        logger.info(f"批量请求完成: {len(prompts) - failed}/{len(prompts)} 成功")
+        return (responses, errors, failed)
+
 # 节点注册
 NODE_CLASS_MAPPINGS = {
-    "DeepSeek_Online": ComfyUI_LLM_Online
+    "DeepSeek_Online": ComfyUI_LLM_Online,
+    "DeepSeek_Online_Batch": ComfyUI_LLM_Online_Batch
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
-    "DeepSeek_Online": "🧠 DeepSeek 智能助手"
+    "DeepSeek_Online": "🧠 DeepSeek 智能助手",
+    "DeepSeek_Online_Batch": "🧠 DeepSeek 批量请求"
 }
\ No newline at end of file
@@ -1,14 +1,391 @@
-import cv2
-import torch
-import numpy as np
- 
-import tempfile
 import subprocess
 import os
+import re
+import threading
+import multiprocessing
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# cv2、torch、numpy、imageio_ffmpeg 在节点执行时才导入，避免拖慢 ComfyUI 启动
+
+
+def _env_int(name: str, default: int) -> int:
+    """读取整数环境变量，非法值回退默认值"""
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# (视频路径, 修改时间, 起始帧, 结束帧, 解码参数) -> 解码后的帧张量，仅保留最近使用的若干片段
+_clip_cache = OrderedDict()
+_clip_cache_lock = threading.Lock()
+CLIP_CACHE_SIZE = _env_int("COMFYUI_VIDEO_CLIP_CACHE", 4)
+
+
+# 每个解码进程至少分到的帧数：分段起点需要从前一个关键帧解码到目标帧，过短的分段得不偿失
+MIN_FRAMES_PER_WORKER = 16
+
+# 共享内存（/dev/shm）在分配缓冲区之外需保留的余量
+SHM_HEADROOM = 16 * 1024 * 1024
+
+# 解码并行方式：process（fork 进程池，默认）或 thread（线程池）
+DECODE_POOL_MODE = os.environ.get("COMFYUI_VIDEO_DECODE_POOL", "process")
+
+# 进程内唯一的解码进程池，并行数变化时重建
+_decode_pool = None
+_decode_pool_size = 0
+_decode_pool_lock = threading.Lock()
+
+
+def _get_decode_pool(workers: int):
+    """
+    视频解码进程池：仅在支持 fork 的平台使用（子进程直接继承已加载的模块，无需重新导入 ComfyUI），
+    其它平台或 COMFYUI_VIDEO_DECODE_POOL=thread 时返回 None，由调用方改用线程（OpenCV 解码时会释放 GIL）。
+
+    注意：进程池从已加载 torch/cv2 且有多个线程的 ComfyUI 进程 fork 而来，
+    若 fork 时其它线程恰好持有锁（如 OpenCV/OpenMP 内部线程池），子进程可能死锁；
+    子进程只使用 cv2/ffmpeg 与共享内存，不触碰 CUDA。遇到卡死时可设置 COMFYUI_VIDEO_DECODE_POOL=thread。
+    """
+    global _decode_pool, _decode_pool_size
+    if DECODE_POOL_MODE != "process" or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    with _decode_pool_lock:
+        if _decode_pool is not None and _decode_pool_size != workers:
+            _decode_pool.shutdown(wait=False, cancel_futures=True)
+            _decode_pool = None
+        if _decode_pool is None:
+            _decode_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+            _decode_pool_size = workers
+        return _decode_pool
+
+
+def _discard_decode_pool(pool):
+    """子进程异常退出后进程池永久不可用，丢弃以便下次重建"""
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is pool:
+            _decode_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _shm_fits(size: int) -> bool:
+    """
+    共享内存位于 /dev/shm（Docker 默认仅 64MB），缓冲区超出剩余空间时子进程写入会触发 SIGBUS，
+    此时应改用进程内缓冲区与线程解码。
+    """
+    try:
+        stat = os.statvfs("/dev/shm")
+    except (OSError, AttributeError):
+        return True
+    return stat.f_bavail * stat.f_frsize >= size + SHM_HEADROOM
+
+
+def _opencv_decode_into(video_path: str, start: int, count: int, out) -> int:
+    """OpenCV 解码：定位到 start 帧，把最多 count 帧 RGB 数据直接写入 uint8 数组 out，返回实际解码帧数"""
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"无法打开视频文件: {video_path}")
+    try:
+        if start > 0:
+            # OpenCV 会从前一个关键帧解码到目标帧，分段起点无需与关键帧对齐
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for i in range(count):
+            ret, frame = cap.read()
+            if not ret:
+                return i
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=out[i])
+        return count
+    finally:
+        cap.release()
+
+
+def _ffmpeg_exe() -> str:
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def _ffmpeg_filters(width: int, height: int, source_size: tuple, fps: float) -> list:
+    """先按帧率抽帧再缩放，减少参与缩放的帧数"""
+    filters = []
+    if fps > 0:
+        filters.append(f"fps={fps:g}")
+    if (width, height) != tuple(source_size):
+        filters.append(f"scale={width}:{height}")
+    return ['-vf', ",".join(filters)] if filters else []
+
+
+def _ffmpeg_decode_into(video_path: str, start: int, count: int, out, source_size: tuple, frame_rate: float,
+                        fps: float = 0) -> int:
+    """
+    ffmpeg 解码：缩放、抽帧与 rgb24 转换都在 ffmpeg 内完成，
+    rawvideo 输出经管道 readinto 直接写入预分配的 uint8 数组 out，Python 侧不做逐帧转换。
+    start/count 以输出帧（抽帧后）计，按时间戳定位，可变帧率视频可能有一帧偏差。
+    """
+    height, width = out.shape[1], out.shape[2]
+    cmd = [_ffmpeg_exe(), '-v', 'error', '-nostdin']
+    if start > 0:
+        # 定位到目标帧前半帧处，避免浮点误差跳过目标帧
+        cmd += ['-ss', f'{(start - 0.5) / (fps or frame_rate):.6f}']
+    cmd += ['-i', video_path, '-map', '0:v:0', '-an', '-sn']
+    cmd += _ffmpeg_filters(width, height, source_size, fps)
+    # 关闭恒定帧率补帧：定位起点早于目标帧半帧，默认模式会重复输出首帧
+    cmd += ['-fps_mode', 'passthrough', '-frames:v', str(count), '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1']
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    view = memoryview(out).cast('B')
+    total = 0
+    try:
+        while total < len(view):
+            n = proc.stdout.readinto(view[total:])
+            if not n:
+                break
+            total += n
+    finally:
+        view.release()
+        proc.stdout.close()
+        stderr = proc.stderr.read()
+        proc.stderr.close()
+        proc.wait()
+    if total == 0 and proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg 解码失败: {stderr.decode('utf-8', 'replace').strip()}")
+    return total // (height * width * 3)
+
+
+def _decode_segment_into(video_path: str, start: int, count: int, out, backend: str = "opencv",
+                         source_size: tuple = None, frame_rate: float = 0, fps: float = 0) -> int:
+    """按解码后端把 [start, start + count) 帧写入 out，返回实际解码帧数"""
+    if backend == "ffmpeg":
+        return _ffmpeg_decode_into(video_path, start, count, out, source_size, frame_rate, fps)
+    return _opencv_decode_into(video_path, start, count, out)
+
+
+def _decode_segment_shm(video_path: str, start: int, count: int, shm_name: str, offset: int, shape: tuple,
+                        options: dict) -> int:
+    """解码进程入口：按名称挂载共享内存，将分段解码到其中 [offset, offset + count) 的位置"""
+    import numpy as np
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        frames = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        decoded = _decode_segment_into(video_path, start, count, frames[offset:offset + count], **options)
+        del frames
+        return decoded
+    finally:
+        shm.close()
+
+
+def _probe_video(video_path: str):
+    """
+    解析 ffmpeg -i 输出，返回 ((高, 宽), 帧率)。
+    带 90/270 度旋转元数据的视频 ffmpeg 会自动旋转，宽高随之互换。
+    """
+    proc = subprocess.run([_ffmpeg_exe(), '-hide_banner', '-nostdin', '-i', video_path],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    info = proc.stderr.decode('utf-8', 'replace')
+    video_line = next((line for line in info.splitlines() if "Video:" in line), None)
+    size = re.search(r', (\d{2,5})x(\d{2,5})\b', video_line or "")
+    if size is None:
+        raise FileNotFoundError(f"无法打开视频文件: {video_path}")
+    width, height = int(size.group(1)), int(size.group(2))
+    rate = re.search(r'([\d.]+) fps', video_line) or re.search(r'([\d.]+) tbr', video_line)
+    frame_rate = float(rate.group(1)) if rate else 25.0
+    rotation = re.search(r'rotation of (-?[\d.]+) degrees', info) or re.search(r'rotate\s*:\s*(-?\d+)', info)
+    if rotation and round(abs(float(rotation.group(1)))) % 180 == 90:
+        width, height = height, width
+    return (height, width), frame_rate
+
+
+def _ffmpeg_count_frames(video_path: str, fps: float = 0) -> int:
+    """
+    ffmpeg 索引遍历：不抽帧时复制视频包并由 framecrc 每包输出一行，按行计数（不解码）；
+    抽帧时需经过 fps 滤镜解码，从进度输出中读取输出帧数。
+    """
+    cmd = [_ffmpeg_exe(), '-hide_banner', '-nostdin', '-i', video_path, '-map', '0:v:0']
+    if fps <= 0:
+        cmd += ['-c', 'copy', '-f', 'framecrc', '-']
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if proc.returncode != 0:
+            raise FileNotFoundError(f"无法打开视频文件: {video_path}")
+        return sum(1 for line in proc.stdout.splitlines() if line and not line.startswith(b"#"))
+    cmd += ['-vf', f'fps={fps:g}', '-f', 'null', '-']
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    counts = re.findall(r'frame=\s*(\d+)', proc.stderr.decode('utf-8', 'replace'))
+    if not counts:
+        raise FileNotFoundError(f"无法打开视频文件: {video_path}")
+    return int(counts[-1])
+
+
+def _video_props(video_path: str):
+    """通过 OpenCV 读取视频，返回 ((高, 宽), 帧率)"""
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"无法打开视频文件: {video_path}")
+    try:
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)))
+        return size, cap.get(cv2.CAP_PROP_FPS) or 25.0
+    finally:
+        cap.release()
+
+
+def _extract_audio(video_path: str, sample_rate: int = 44100, channels: int = 2) -> dict:
+    """
+    通过 ffmpeg 管道以 f32le 原始采样直接读入内存（不落临时 wav 文件），
+    返回 ComfyUI 官方格式 {"waveform": (1, channels, samples), "sample_rate": ...}；无音轨时返回空音频。
+    """
+    import numpy as np
+    import torch
+    cmd = [_ffmpeg_exe(), '-v', 'error', '-nostdin', '-i', video_path, '-map', '0:a:0?', '-vn',
+           '-f', 'f32le', '-ac', str(channels), '-ar', str(sample_rate), 'pipe:1']
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    data = proc.stdout
+    samples = len(data) // (4 * channels)
+    if samples == 0:
+        print(f"警告：视频 {video_path} 无音轨或音频提取失败，返回空音频。")
+        return {"waveform": torch.zeros((1, channels, 1), dtype=torch.float32), "sample_rate": sample_rate}
+    # 交错的 (samples, channels) -> (1, channels, samples)，仅此一次拷贝
+    interleaved = np.frombuffer(data, dtype=np.float32, count=samples * channels).reshape(samples, channels)
+    waveform = torch.from_numpy(np.ascontiguousarray(interleaved.T)).unsqueeze(0)
+    return {"waveform": waveform, "sample_rate": sample_rate}
+
+
+def _slice_audio(audio: dict, start: int, end: int, fps: float, last: bool = False) -> dict:
+    """
+    按帧范围 [start, end) 与帧率截取对应的采样区间，返回共享同一波形存储的视图；
+    最后一个片段包含剩余的全部采样。
+    """
+    waveform, sample_rate = audio["waveform"], audio["sample_rate"]
+    first = min(round(start * sample_rate / fps), waveform.shape[-1])
+    stop = waveform.shape[-1] if last else min(round(end * sample_rate / fps), waveform.shape[-1])
+    return {"waveform": waveform[..., first:stop], "sample_rate": sample_rate}
+
+
+def _decode_frames(video_path: str, start: int, count: int, height: int, width: int, workers: int = 1, **options):
+    """
+    解码 [start, start + count) 帧，返回 (N, height, width, 3) float32 张量，options 为解码后端参数。
+    workers > 1 时将范围切分为连续分段，由各进程（或线程）独立打开视频、定位并解码，
+    直接写入同一块共享内存 uint8 缓冲区的对应位置，最后统一做一次归一化。
+    """
+    import numpy as np
+    import torch
+    shape = (count, height, width, 3)
+    pool_size = workers
+    workers = max(1, min(workers, count // MIN_FRAMES_PER_WORKER))
+    step = -(-count // workers)
+    segments = [(offset, min(step, count - offset)) for offset in range(0, count, step)]
+
+    shm = None
+    nbytes = count * height * width * 3
+    pool = None
+    if workers > 1:
+        if _shm_fits(nbytes):
+            pool = _get_decode_pool(pool_size)
+        else:
+            print(f"共享内存空间不足（需要 {nbytes / 1024 / 1024:.0f}MB），改用线程解码")
+    if pool is not None:
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        buffer = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    else:
+        buffer = np.empty(shape, dtype=np.uint8)
+    try:
+        decoded = None
+        if pool is not None:
+            try:
+                futures = [
+                    pool.submit(_decode_segment_shm, video_path, start + offset, size, shm.name, offset, shape, options)
+                    for offset, size in segments
+                ]
+                decoded = [f.result() for f in futures]
+            except BrokenProcessPool:
+                # 解码进程异常退出（如内存不足被杀），丢弃进程池，本次改用线程解码
+                print("视频解码进程异常退出，已重建进程池，本片段改用线程解码")
+                _discard_decode_pool(pool)
+        if decoded is None and workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                decoded = list(executor.map(
+                    lambda seg: _decode_segment_into(video_path, start + seg[0], seg[1], buffer[seg[0]:seg[0] + seg[1]], **options),
+                    segments,
+                ))
+        elif decoded is None:
+            decoded = [_decode_segment_into(video_path, start, count, buffer, **options)]
+
+        # 容器帧数不准确时某段可能提前结束，只保留从头开始连续解码成功的部分
+        valid = 0
+        for (offset, size), n in zip(segments, decoded):
+            valid = offset + n
+            if n < size:
+                break
+        if valid == 0:
+            raise ValueError(f"视频 {video_path} 第 {start} 帧起无法解码")
+        frames = torch.from_numpy(buffer[:valid]).to(torch.float32).mul_(1.0 / 255.0)
+    finally:
+        del buffer
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+    return frames
+
+
+class VideoClip(Mapping):
+    """
+    惰性视频片段句柄：只记录视频路径与帧范围，读取 clip["frames"] 时才定位并解码该范围，
+    最近解码的若干片段保留在 LRU 缓存中（数量由环境变量 COMFYUI_VIDEO_CLIP_CACHE 配置）。
+    兼容原先的 {"frames": ..., "audio": ...} 字典用法。
+    """
+
+    def __init__(self, video_path: str, start: int, end: int, audio: dict, decode_options: dict = None):
+        self.video_path = video_path
+        self.start = start
+        self.end = end
+        self.audio = audio
+        # 输出宽高、并行数与解码后端参数，见 _decode_frames
+        self.decode_options = decode_options or {}
+        self.mtime = os.path.getmtime(video_path)
+
+    @property
+    def num_frames(self) -> int:
+        return self.end - self.start
+
+    def load_frames(self):
+        cache_key = (self.video_path, self.mtime, self.start, self.end, tuple(sorted(self.decode_options.items())))
+        with _clip_cache_lock:
+            frames = _clip_cache.get(cache_key)
+            if frames is not None:
+                _clip_cache.move_to_end(cache_key)
+                return frames
+        frames = _decode_frames(self.video_path, self.start, self.num_frames, **self.decode_options)
+        if CLIP_CACHE_SIZE > 0:
+            with _clip_cache_lock:
+                _clip_cache[cache_key] = frames
+                while len(_clip_cache) > CLIP_CACHE_SIZE:
+                    _clip_cache.popitem(last=False)
+        return frames
+
+    def __getitem__(self, key):
+        if key == "frames":
+            return self.load_frames()
+        if key == "audio":
+            return self.audio
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(("frames", "audio"))
+
+    def __len__(self):
+        return 2
+
+    def __repr__(self):
+        return f"VideoClip({self.video_path!r}, frames {self.start}-{self.end})"
+
 
 class SplitVideoByFrames:
     """
-    用OpenCV拆分视频为多个片段，每段帧数不超过max_frames_per_clip，音频输出为ComfyUI官方格式
+    用OpenCV或ffmpeg拆分视频为多个片段，每段帧数不超过max_frames_per_clip，音频输出为ComfyUI官方格式
+    片段为惰性句柄：此处只由 ffmpeg 复制视频包统计帧数（抽帧时除外），图片在获取片段时才按需解码
     """
     @classmethod
     def INPUT_TYPES(cls):
@@ -16,6 +393,17 @@ class SplitVideoByFrames:
             "required": {
                 "video_path": ("STRING", {"default": "your_video.mp4"}),
                 "max_frames_per_clip": ("INT", {"default": 30, "min": 1, "max": 1000}),
+            },
+            "optional": {
+                # 片段解码并行数：默认 1 为当前进程内顺序解码；大于 1 时启用 fork 进程池（需自行确认无死锁风险），0 为按 CPU 核数
+                "decode_workers": ("INT", {"default": 1, "min": 0, "max": 64}),
+                # ffmpeg 解码器在 ffmpeg 内完成缩放、抽帧与 RGB 转换，以下参数仅对 ffmpeg 生效
+                "decoder": (["opencv", "ffmpeg"], {"default": "opencv"}),
+                # 输出宽高：均为 0 保持原尺寸，仅一项为 0 时按比例缩放
+                "scale_width": ("INT", {"default": 0, "min": 0, "max": 8192}),
+                "scale_height": ("INT", {"default": 0, "min": 0, "max": 8192}),
+                # 抽帧后的帧率，0 保持原帧率；片段帧数按抽帧后的帧计
+                "output_fps": ("FLOAT", {"default": 0, "min": 0, "max": 240}),
             }
         }
 
@@ -24,53 +412,44 @@ class SplitVideoByFrames:
     FUNCTION = "split_video"
     CATEGORY = "云服务"
 
-    def split_video(self, video_path, max_frames_per_clip):
-        # 1. 提取音频为wav临时文件
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_audio:
-            audio_path = tmp_audio.name
-        ffmpeg_bin = "ffmpeg"  # 假设已在环境变量
-        cmd = [ffmpeg_bin, '-y', '-i', video_path, '-vn', '-acodec', 'pcm_s16le', '-ar', '44100', '-ac', '2', '-f', 'wav', audio_path]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        # 检查音频文件是否有效
-        if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
-            print(f"警告：视频 {video_path} 无音轨或音频提取失败，返回空音频。")
-            waveform = torch.zeros((1, 2, 1), dtype=torch.float32)  # 1帧2通道空音频
-            sample_rate = 44100
-            audio_dict = {"waveform": waveform, "sample_rate": sample_rate}
+    def _decode_options(self, video_path, decoder, decode_workers, scale_width, scale_height, output_fps):
+        """
+        解析一次视频尺寸并确定输出宽高，片段解码时不再重复探测。
+        返回 (解码参数, 片段帧率)，片段帧率用于按帧范围截取音频。
+        """
+        options = {"workers": decode_workers or (os.cpu_count() or 1)}
+        if decoder != "ffmpeg":
+            (options["height"], options["width"]), frame_rate = _video_props(video_path)
+            return options, frame_rate
+        (height, width), frame_rate = _probe_video(video_path)
+        if scale_width and scale_height:
+            out_size = (scale_height, scale_width)
+        elif scale_width:
+            out_size = (max(1, round(height * scale_width / width)), scale_width)
+        elif scale_height:
+            out_size = (scale_height, max(1, round(width * scale_height / height)))
         else:
-            try:
-                import torchaudio
-                waveform, sample_rate = torchaudio.load(audio_path)
-            except Exception as e:
-                print(f"警告：音频文件读取失败，返回空音频。错误信息: {e}")
-                waveform = torch.zeros((1, 2, 1), dtype=torch.float32)
-                sample_rate = 44100
-            audio_dict = {"waveform": waveform, "sample_rate": sample_rate}
-        os.remove(audio_path)
-        # 保证shape为(1,channels,samples)
-        if waveform.dim() == 2:
-            waveform = waveform.unsqueeze(0)
-        audio_dict = {"waveform": waveform, "sample_rate": sample_rate}
-
-        # 3. 视频分帧（不做resize，假设视频分辨率一致）
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise FileNotFoundError(f"无法打开视频文件: {video_path}")
-        frames = []
+            out_size = (height, width)
+        options.update(
+            height=out_size[0], width=out_size[1], backend="ffmpeg",
+            source_size=(width, height), frame_rate=frame_rate, fps=output_fps,
+        )
+        return options, output_fps or frame_rate
+
+    def split_video(self, video_path, max_frames_per_clip, decode_workers=1, decoder="opencv",
+                    scale_width=0, scale_height=0, output_fps=0):
+        # 1. 音频经 ffmpeg 管道直接读入内存，各片段只持有对应采样区间的视图
+        audio_dict = _extract_audio(video_path)
+
+        # 2. 建立片段索引（不做resize，假设视频分辨率一致）
+        decode_options, clip_fps = self._decode_options(video_path, decoder, decode_workers, scale_width, scale_height, output_fps)
+        # 帧数由 ffmpeg 复制视频包计数得到，两种解码器共用；只有 ffmpeg 抽帧时才需要解码
+        total_frames = _ffmpeg_count_frames(video_path, output_fps if decoder == "ffmpeg" else 0)
         clips = []
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            np_image = frame.astype(np.float32) / 255.0
-            frames.append(torch.from_numpy(np_image))
-            if len(frames) == max_frames_per_clip:
-                clips.append({"frames": torch.stack(frames, dim=0), "audio": audio_dict})
-                frames = []
-        if frames:
-            clips.append({"frames": torch.stack(frames, dim=0), "audio": audio_dict})
-        cap.release()
+        for start in range(0, total_frames, max_frames_per_clip):
+            end = min(start + max_frames_per_clip, total_frames)
+            clip_audio = _slice_audio(audio_dict, start, end, clip_fps, last=end == total_frames)
+            clips.append(VideoClip(video_path, start, end, clip_audio, decode_options))
         return (len(clips), clips, audio_dict)
 
 class GetVideoClipByIndex:
@@ -101,6 +480,76 @@ class GetVideoClipByIndex:
         num_frames = frames.shape[0]
         return (frames, audio, num_frames)
 
+class _BatchStorage:
+    """ImageBatchBuffer 共享的底层存储：预分配容量的张量与已占用帧数"""
+
+    def __init__(self, tensor):
+        self.tensor = tensor
+        self.used = 0
+
+
+def _to_image_batch(images):
+    """统一为 (N, H, W, 3) 的 batch，单通道复制为三通道，去掉 alpha 通道"""
+    if images.dim() == 3:
+        images = images.unsqueeze(0)
+    if images.shape[-1] == 1:
+        images = images.expand(-1, -1, -1, 3)
+    elif images.shape[-1] == 4:
+        images = images[..., :3]
+    return images
+
+
+class ImageBatchBuffer:
+    """
+    可增长的图像 batch：底层存储按容量倍增预分配，逐次追加的总拷贝量为 O(N)，
+    取代循环中反复 torch.cat 的 O(N²) 拷贝。
+
+    每次 append 返回新的 ImageBatchBuffer，与原对象共享存储：
+    仅当追加发生在存储当前末尾时原地写入，否则（分支、节点重复执行）复制出独立存储，
+    因此已有的 buffer 及其 tensor() 视图内容不会被后续追加改变。
+    """
+
+    INITIAL_CAPACITY = 16
+
+    def __init__(self, storage: _BatchStorage = None, size: int = 0):
+        self._storage = storage
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._storage is None else self._storage.tensor.shape[0]
+
+    def append(self, images, capacity_hint: int = 0) -> "ImageBatchBuffer":
+        import torch
+        images = _to_image_batch(images)
+        count = images.shape[0]
+        if count == 0:
+            return self
+        storage = self._storage
+        needed = self.size + count
+        if storage is not None and storage.tensor.shape[1:] != images.shape[1:]:
+            raise ValueError(f"图片尺寸不一致: batch 为 {tuple(storage.tensor.shape[1:])}，追加的为 {tuple(images.shape[1:])}")
+        if storage is None or storage.used != self.size or needed > self.capacity:
+            capacity = max(needed, capacity_hint, self.INITIAL_CAPACITY, 2 * self.capacity)
+            tensor = torch.empty((capacity, *images.shape[1:]), dtype=images.dtype, device=images.device)
+            if self.size:
+                tensor[:self.size].copy_(storage.tensor[:self.size])
+            storage = _BatchStorage(tensor)
+        storage.tensor[self.size:needed].copy_(images)
+        storage.used = needed
+        return ImageBatchBuffer(storage, needed)
+
+    def tensor(self):
+        """返回当前内容的 (N, H, W, 3) 张量视图，不拷贝；为空时返回 (0, 0, 0, 0) 空 batch"""
+        import torch
+        if self.size == 0:
+            return torch.empty((0, 0, 0, 0), dtype=torch.float32)
+        return self._storage.tensor[:self.size]
+
+
 class CreateEmptyImageBatch:
     """
     创建一个空的图像batch，若传入images则追加到空batch后返回。
@@ -182,12 +631,13 @@ class AppendImagesToBatch:
 class GetFirstImageFromBatch:
     """
     获取图片batch的首帧或末帧，输出单帧IMAGE batch（shape为(1, H, W, C)）及宽高。
+    也接受 IMAGE_BUFFER，直接返回其存储的视图，不拷贝。
     """
     @classmethod
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "image_batch": ("IMAGE", {}),
+                "image_batch": ("IMAGE,IMAGE_BUFFER", {}),
                 "mode": (["first", "last"], {"default": "first"}),
             }
         }
@@ -198,7 +648,10 @@ class GetFirstImageFromBatch:
     CATEGORY = "云服务/集合工具"
 
     def get(self, image_batch, mode="first"):
-        import torch
+        if isinstance(image_batch, ImageBatchBuffer):
+            if len(image_batch) == 0:
+                raise ValueError("image_batch is empty!")
+            image_batch = image_batch.tensor()
         if image_batch.dim() == 3:
             img = image_batch.unsqueeze(0)
         else:
@@ -215,12 +668,13 @@ class GetFirstImageFromBatch:
 class RemoveFirstOrLastImageFromBatch:
     """
     删除图片batch的首帧或末帧，输出剩余IMAGE batch。
+    也接受 IMAGE_BUFFER，输出为其存储的视图，不拷贝。
     """
     @classmethod
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "image_batch": ("IMAGE", {}),
+                "image_batch": ("IMAGE,IMAGE_BUFFER", {}),
                 "mode": (["first", "last"], {"default": "first"}),
             }
         }
@@ -232,6 +686,8 @@ class RemoveFirstOrLastImageFromBatch:
 
     def remove(self, image_batch, mode="first"):
         import torch
+        if isinstance(image_batch, ImageBatchBuffer):
+            image_batch = image_batch.tensor()
         if image_batch.dim() == 3:
             # 只有一张，删除后为空batch
             return (torch.empty((0, *image_batch.shape), dtype=image_batch.dtype, device=image_batch.device),)
@@ -242,13 +698,83 @@ class RemoveFirstOrLastImageFromBatch:
         else:
             return (image_batch[:-1],)
 
+class CreateImageBatchBuffer:
+    """
+    创建可增长的图像 batch 缓冲区（IMAGE_BUFFER），可选传入初始图片与预估总帧数。
+    循环中逐次追加时使用本组节点代替 创建空图像Batch/追加图片到Batch，避免反复整体拷贝。
+    """
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "optional": {
+                "images": ("IMAGE", {}),
+                # 预估总帧数，已知时一次分配到位；0 为按需倍增
+                "capacity": ("INT", {"default": 0, "min": 0, "max": 100000}),
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE_BUFFER",)
+    RETURN_NAMES = ("image_buffer",)
+    FUNCTION = "create"
+    CATEGORY = "云服务/集合工具"
+
+    def create(self, images=None, capacity=0):
+        buffer = ImageBatchBuffer()
+        if images is not None:
+            buffer = buffer.append(images, capacity)
+        return (buffer,)
+
+class AppendImagesToBuffer:
+    """
+    向 IMAGE_BUFFER 追加图片，均摊 O(1) 拷贝，输出追加后的缓冲区。
+    """
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "image_buffer": ("IMAGE_BUFFER", {}),
+                "images_to_add": ("IMAGE", {}),
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE_BUFFER",)
+    RETURN_NAMES = ("image_buffer",)
+    FUNCTION = "append"
+    CATEGORY = "云服务/集合工具"
+
+    def append(self, image_buffer, images_to_add):
+        return (image_buffer.append(images_to_add),)
+
+class FinalizeImageBatchBuffer:
+    """
+    将 IMAGE_BUFFER 转为 IMAGE batch（存储视图，不拷贝）及帧数。
+    """
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "image_buffer": ("IMAGE_BUFFER", {}),
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE", "INT")
+    RETURN_NAMES = ("image_batch", "count")
+    FUNCTION = "finalize"
+    CATEGORY = "云服务/集合工具"
+
+    def finalize(self, image_buffer):
+        return (image_buffer.tensor(), len(image_buffer))
+
 NODE_CLASS_MAPPINGS = {
     "SplitVideoByFrames": SplitVideoByFrames,
     "GetVideoClipByIndex": GetVideoClipByIndex,
     "CreateEmptyImageBatch": CreateEmptyImageBatch,
     "AppendImagesToBatch": AppendImagesToBatch,
     "GetFirstImageFromBatch": GetFirstImageFromBatch,
-    "RemoveFirstOrLastImageFromBatch": RemoveFirstOrLastImageFromBatch
+    "RemoveFirstOrLastImageFromBatch": RemoveFirstOrLastImageFromBatch,
+    "CreateImageBatchBuffer": CreateImageBatchBuffer,
+    "AppendImagesToBuffer": AppendImagesToBuffer,
+    "FinalizeImageBatchBuffer": FinalizeImageBatchBuffer
 }
 NODE_DISPLAY_NAME_MAPPINGS = {
     "SplitVideoByFrames": "🎬 视频分段拆帧",
@@ -256,5 +782,8 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "CreateEmptyImageBatch": "📂 创建空图像Batch",
     "AppendImagesToBatch": "➕ 追加图片到Batch",
     "GetFirstImageFromBatch": "🔍 获取首/末帧图片",
-    "RemoveFirstOrLastImageFromBatch": "❌ 删除首/末帧图片"
+    "RemoveFirstOrLastImageFromBatch": "❌ 删除首/末帧图片",
+    "CreateImageBatchBuffer": "📦 创建可增长图像缓冲",
+    "AppendImagesToBuffer": "➕ 追加图片到缓冲",
+    "FinalizeImageBatchBuffer": "📤 缓冲转为图像Batch"
 }
\ No newline at end of file
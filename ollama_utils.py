@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import logging
+import threading
+from array import array
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+
+
+def _env_int(name: str, default: int) -> int:
+    """读取整数环境变量，非法值回退默认值"""
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_ollama_url() -> str:
+    """
+    获取 Ollama 服务地址，兼容 Ollama 官方的 OLLAMA_HOST 环境变量。
+    """
+    host = os.environ.get("OLLAMA_HOST", "").strip()
+    if not host or host.startswith("0.0.0.0"):
+        return DEFAULT_OLLAMA_URL
+    if not host.startswith("http://") and not host.startswith("https://"):
+        host = "http://" + host
+    return host.rstrip("/")
+
+
+def get_max_parallel() -> int:
+    """
+    单个 Ollama 服务允许同时进行的生成请求数。
+    优先读取 COMFYUI_OLLAMA_MAX_PARALLEL，其次与服务端 OLLAMA_NUM_PARALLEL 保持一致，默认 1（串行）。
+    """
+    value = _env_int("COMFYUI_OLLAMA_MAX_PARALLEL", _env_int("OLLAMA_NUM_PARALLEL", 1))
+    return max(1, value)
+
+
+def get_models_ttl() -> int:
+    """模型列表缓存有效期（秒），过期后在后台重新拉取 /api/tags"""
+    return max(1, _env_int("COMFYUI_OLLAMA_MODELS_TTL", 60))
+
+
+class EndpointLimiter:
+    """
+    单个服务地址的并发上限，用法与信号量相同（with limiter: ...）。
+    与 threading.BoundedSemaphore 不同，上限可在运行时调整：
+    调低时已在进行的请求不受影响，新请求等到进行中的数量低于新上限后才开始。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._cond = threading.Condition()
+
+    def set_limit(self, limit: int):
+        with self._cond:
+            self.limit = max(1, limit)
+            self._cond.notify_all()
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# 每个服务地址一个并发限制器，所有节点实例共享
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+
+def get_endpoint_semaphore(url: str, limit: int = None) -> EndpointLimiter:
+    """
+    获取指定 Ollama 服务地址的并发限制器（进程内所有节点共享）。
+    同一地址只创建一次，上限默认取 get_max_parallel()，limit 仅在首次创建时生效。
+    """
+    with _semaphores_lock:
+        sem = _semaphores.get(url)
+        if sem is None:
+            sem = EndpointLimiter(limit or get_max_parallel())
+            _semaphores[url] = sem
+        return sem
+
+
+def get_timeouts() -> tuple:
+    """
+    (连接超时, 读取超时)，单位秒。
+    连接超时应当很短以便快速发现服务未启动；读取超时需覆盖长文本生成。
+    """
+    connect_timeout = _env_int("COMFYUI_OLLAMA_CONNECT_TIMEOUT", 5)
+    read_timeout = _env_int("COMFYUI_OLLAMA_READ_TIMEOUT", 120)
+    return (connect_timeout, read_timeout)
+
+
+# 每个服务地址一个长连接会话，所有节点实例共享
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url: str) -> requests.Session:
+    """
+    获取指定 Ollama 服务地址的共享 Session（keep-alive 连接池）。
+    连接池大小通过 COMFYUI_OLLAMA_POOL_SIZE 配置，默认不小于并发数；
+    连接失败和 502/503/504 按指数退避重试 COMFYUI_OLLAMA_RETRIES 次，读取超时/中断不重试。
+    """
+    with _sessions_lock:
+        session = _sessions.get(url)
+        if session is None:
+            pool_size = max(_env_int("COMFYUI_OLLAMA_POOL_SIZE", 4), get_max_parallel())
+            retry = Retry(
+                total=_env_int("COMFYUI_OLLAMA_RETRIES", 2),
+                # 请求已发出后的读取失败不重试：POST 生成请求重发会让服务端重复推理
+                read=False,
+                backoff_factor=0.5,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset(["GET", "POST"]),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.headers.update({"Content-Type": "application/json"})
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[url] = session
+        return session
+
+
+class OllamaContext:
+    """
+    Ollama 会话上下文（ComfyUI 类型 OLLAMA_CONTEXT），在节点间按引用传递，避免 JSON 编解码。
+
+    - tokens: /api/generate 返回的上下文 token id，使用 array('i') 紧凑存储
+    - messages: /api/chat 模式下的对话历史（不含系统提示）
+    实例视为不可变，每次生成都会返回新的上下文对象。
+    """
+
+    def __init__(self, tokens=None, messages=None, model: str = None):
+        self.tokens = tokens if isinstance(tokens, array) else array('i', tokens or [])
+        self.messages = list(messages or [])
+        self.model = model
+
+    def __len__(self):
+        return len(self.tokens) or len(self.messages)
+
+    def __repr__(self):
+        return f"OllamaContext(model={self.model!r}, tokens={len(self.tokens)}, messages={len(self.messages)})"
+
+    def to_json(self) -> str:
+        """兼容旧版 STRING 上下文格式"""
+        if self.messages:
+            return json.dumps(self.messages, ensure_ascii=False)
+        return json.dumps(self.tokens.tolist())
+
+
+# ----------------------------
+# 模型预热 / 驻留 / 延迟统计
+# ----------------------------
+# load_duration 超过该阈值（秒）视为冷启动（模型需要从磁盘加载）
+COLD_START_THRESHOLD = 0.5
+
+def parse_keep_alive(keep_alive):
+    """keep_alive 支持时长字符串（如 5m、1h）或秒数，-1 表示常驻"""
+    if isinstance(keep_alive, str):
+        keep_alive = keep_alive.strip()
+        try:
+            return int(keep_alive)
+        except ValueError:
+            return keep_alive
+    return keep_alive
+
+
+_latency_stats = {}
+_latency_lock = threading.Lock()
+
+
+def record_latency(model: str, seconds: float, load_duration_ns: int = 0):
+    """记录一次生成耗时，按 Ollama 返回的 load_duration 区分冷/热启动"""
+    kind = "cold" if load_duration_ns / 1e9 >= COLD_START_THRESHOLD else "warm"
+    with _latency_lock:
+        stats = _latency_stats.setdefault(model, {}).setdefault(
+            kind, {"count": 0, "total": 0.0, "min": None, "max": 0.0}
+        )
+        stats["count"] += 1
+        stats["total"] += seconds
+        stats["min"] = seconds if stats["min"] is None else min(stats["min"], seconds)
+        stats["max"] = max(stats["max"], seconds)
+
+
+def get_latency_stats() -> dict:
+    """返回各模型冷/热启动耗时统计：{model: {"cold"|"warm": {count, avg, min, max}}}"""
+    with _latency_lock:
+        return {
+            model: {
+                kind: {
+                    "count": s["count"],
+                    "avg": s["total"] / s["count"],
+                    "min": s["min"],
+                    "max": s["max"],
+                }
+                for kind, s in kinds.items()
+            }
+            for model, kinds in _latency_stats.items()
+        }
+
+
+def list_running_models(url: str) -> list:
+    """通过 /api/ps 查询当前驻留在内存/显存中的模型"""
+    response = get_session(url).get(f"{url}/api/ps", timeout=get_timeouts())
+    response.raise_for_status()
+    return response.json().get("models", [])
+
+
+def preload_model(url: str, model: str, keep_alive="30m") -> dict:
+    """
+    预热模型：发送空 prompt 的生成请求，让 Ollama 加载模型并按 keep_alive 保持驻留。
+    keep_alive 为 -1 时常驻（pin），为 0 时立即卸载。
+    :return: {"model", "seconds", "load_seconds", "cold"}
+    """
+    start = time.perf_counter()
+    response = get_session(url).post(
+        f"{url}/api/generate",
+        json={"model": model, "keep_alive": keep_alive, "stream": False},
+        timeout=get_timeouts(),
+    )
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    load_ns = response.json().get("load_duration", 0) or 0
+    record_latency(model, elapsed, load_ns)
+    return {
+        "model": model,
+        "seconds": elapsed,
+        "load_seconds": load_ns / 1e9,
+        "cold": load_ns / 1e9 >= COLD_START_THRESHOLD,
+    }
+
+
+def start_preload_from_env(url: str = None):
+    """
+    插件启动时在后台线程预热 COMFYUI_OLLAMA_PRELOAD（逗号分隔）中的模型，不阻塞 ComfyUI 启动。
+    COMFYUI_OLLAMA_PIN=1 时以 keep_alive=-1 常驻，否则使用 COMFYUI_OLLAMA_KEEP_ALIVE（默认 30m）。
+    """
+    models = [m.strip() for m in os.environ.get("COMFYUI_OLLAMA_PRELOAD", "").split(",") if m.strip()]
+    if not models:
+        return None
+    url = url or get_ollama_url()
+    keep_alive = -1 if os.environ.get("COMFYUI_OLLAMA_PIN") == "1" else parse_keep_alive(os.environ.get("COMFYUI_OLLAMA_KEEP_ALIVE", "30m"))
+
+    def _run():
+        logger = logging.getLogger("ComfyUI-Ollama")
+        for model in models:
+            try:
+                result = preload_model(url, model, keep_alive)
+                logger.info(f"🔥 模型预热完成: {model}，耗时 {result['seconds']:.2f}s（加载 {result['load_seconds']:.2f}s）")
+            except Exception as e:
+                logger.warning(f"模型预热失败: {model}，{str(e)}")
+
+    thread = threading.Thread(target=_run, name="ollama-preload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,20 @@
+"""
+测试共用：不经过插件 __init__（避免加载全部节点、启动后台线程），
+直接以包的形式导入仓库内的模块，使相对导入（from ..cloud_utils import ...）可用。
+"""
+import os
+import sys
+import types
+import importlib
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "comfyui_llm_test"
+
+
+def load(module: str):
+    """导入仓库内模块，如 load("node.cloud_node")"""
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [REPO_DIR]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{module}")
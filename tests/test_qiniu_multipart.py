@@ -0,0 +1,150 @@
+"""七牛分片上传 v2：用本地假服务器验证 初始化 → 分片 → 合并、断点续传与凭证过期重签"""
+import json
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from conftest import load
+
+cn = load("node.cloud_node")
+
+
+class FakeQiniu(ThreadingHTTPServer):
+    """只实现分片上传 v2 的三个接口，记录每次请求便于断言"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeQiniuHandler)
+        self.uploads = {}
+        self.requests = []
+        self.fail_parts = set()
+        self.expired_tokens = set()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FakeQiniuHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method: str):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        # /buckets/<bucket>/objects/<key>/uploads[/<uploadId>[/<partNumber>]]
+        parts = self.path.strip("/").split("/")[5:]
+        token = self.headers.get("Authorization", "").replace("UpToken ", "")
+        with server.lock:
+            server.requests.append((method, parts))
+            if token in server.expired_tokens:
+                return self._reply(401, {"error": "expired token"})
+            if method == "POST" and not parts:
+                upload_id = f"upload-{len(server.uploads)}"
+                server.uploads[upload_id] = {}
+                return self._reply(200, {"uploadId": upload_id, "expireAt": 2 ** 31})
+            if parts[0] not in server.uploads:
+                return self._reply(612, {"error": "no such uploadId"})
+            stored = server.uploads[parts[0]]
+            if method == "PUT":
+                number = int(parts[1])
+                if number in server.fail_parts:
+                    return self._reply(500, {"error": "injected failure"})
+                stored[number] = body
+                return self._reply(200, {"etag": hashlib.md5(body).hexdigest()})
+            listed = json.loads(body)["parts"]
+            assert all(hashlib.md5(stored[p["partNumber"]]).hexdigest() == p["etag"] for p in listed)
+            content = b"".join(stored[p["partNumber"]] for p in listed)
+            server.content = content
+            return self._reply(200, {"key": "result.bin", "hash": hashlib.sha1(content).hexdigest()})
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+
+@pytest.fixture
+def server():
+    server = FakeQiniu()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def uploader(server, monkeypatch, tmp_path):
+    # 分片失败重试不等待；断点续传记录写到临时目录
+    monkeypatch.setattr(cn.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(cn.tempfile, "gettempdir", lambda: str(tmp_path))
+    return cn.QiniuUploader("ak", "sk", "bucket", "cdn.example.com",
+                            upload_host=server.url, part_size=1024, concurrency=2)
+
+
+@pytest.fixture
+def payload(tmp_path):
+    data = bytes(range(256)) * 20 + b"tail"
+    path = tmp_path / "payload.bin"
+    path.write_bytes(data)
+    return path, data
+
+
+def _put_parts(server):
+    return sorted(int(parts[1]) for method, parts in server.requests if method == "PUT")
+
+
+def test_upload_file_init_parts_complete(server, uploader, payload):
+    path, data = payload
+    url = uploader.upload_file(str(path), "videos/result.bin")
+
+    assert url == "http://cdn.example.com/result.bin"
+    assert server.content == data
+    assert server.requests[0] == ("POST", [])
+    assert _put_parts(server) == [1, 2, 3, 4, 5, 6]
+    assert server.requests[-1] == ("POST", ["upload-0"])
+    # 完成后清除续传记录
+    assert not list((path.parent / "comfyui_llm_upload_records").iterdir())
+
+
+def test_upload_file_resumes_after_interrupted_part(server, uploader, payload):
+    path, data = payload
+    server.fail_parts = {4}
+    with pytest.raises(requests.HTTPError):
+        uploader.upload_file(str(path), "videos/result.bin")
+    uploaded = set(server.uploads["upload-0"])
+    assert 4 not in uploaded
+
+    server.fail_parts = set()
+    server.requests.clear()
+    uploader.upload_file(str(path), "videos/result.bin")
+
+    # 续传沿用同一 uploadId，只补传未完成的分片
+    assert ("POST", []) not in server.requests
+    assert _put_parts(server) == sorted(set(range(1, 7)) - uploaded)
+    assert server.content == data
+
+
+def test_expired_token_is_resigned(server, uploader, payload, monkeypatch):
+    path, data = payload
+    tokens = iter(["stale-token", "fresh-token"])
+    monkeypatch.setattr(uploader, "_multipart_token", lambda key=None: next(tokens))
+    server.expired_tokens = {"stale-token"}
+
+    uploader.upload_file(str(path), "videos/result.bin")
+
+    assert server.requests[0] == ("POST", [])
+    assert server.requests[1] == ("POST", [])
+    assert server.content == data
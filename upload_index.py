@@ -0,0 +1,99 @@
+import os
+import time
+import base64
+import sqlite3
+import hashlib
+import threading
+from typing import Optional
+
+# 七牛 etag 分块大小
+ETAG_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def _etag_from_block_hashes(block_hashes: list) -> str:
+    """
+    七牛 etag 算法：单块时为 0x16 + sha1(内容)；
+    多块时为 0x96 + sha1(各块 sha1 依次拼接)，最后做 URL 安全 base64 编码。
+    """
+    if len(block_hashes) <= 1:
+        digest = b"\x16" + (block_hashes[0] if block_hashes else hashlib.sha1(b"").digest())
+    else:
+        digest = b"\x96" + hashlib.sha1(b"".join(block_hashes)).digest()
+    return base64.urlsafe_b64encode(digest).decode("ascii")
+
+
+def qiniu_etag(data: bytes) -> str:
+    """计算二进制内容的七牛 etag（与七牛返回的 hash 字段一致）"""
+    view = memoryview(data)
+    blocks = [hashlib.sha1(view[i:i + ETAG_BLOCK_SIZE]).digest() for i in range(0, len(view), ETAG_BLOCK_SIZE)]
+    return _etag_from_block_hashes(blocks)
+
+
+def qiniu_etag_file(path: str) -> str:
+    """按块流式读取文件计算七牛 etag，内存占用与文件大小无关"""
+    blocks = []
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(ETAG_BLOCK_SIZE)
+            if not block:
+                break
+            blocks.append(hashlib.sha1(block).digest())
+    return _etag_from_block_hashes(blocks)
+
+
+class UploadIndex:
+    """
+    基于 SQLite 的已上传内容索引：记录 (空间, key) -> (etag, url)，
+    内容寻址上传时命中索引即可直接返回已有 URL，不再传输数据。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            "bucket TEXT NOT NULL, key TEXT NOT NULL, etag TEXT NOT NULL, url TEXT NOT NULL, "
+            "size INTEGER NOT NULL, created REAL NOT NULL, PRIMARY KEY (bucket, key))"
+        )
+
+    def get(self, bucket: str, key: str, etag: str) -> Optional[str]:
+        """命中且内容哈希一致时返回 URL，否则返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, url FROM uploads WHERE bucket = ? AND key = ?", (bucket, key)
+            ).fetchone()
+        if row is None or row[0] != etag:
+            return None
+        return row[1]
+
+    def put(self, bucket: str, key: str, etag: str, url: str, size: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (bucket, key, etag, url, size, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (bucket, key, etag, url, size, time.time())
+            )
+
+    def remove(self, bucket: str, key: str):
+        """对象在云端被删除后可手动移除索引"""
+        with self._lock:
+            self._conn.execute("DELETE FROM uploads WHERE bucket = ? AND key = ?", (bucket, key))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_upload_index() -> UploadIndex:
+    """
+    获取进程内共享的上传索引。
+    可通过环境变量 COMFYUI_UPLOAD_INDEX_PATH 指定数据库路径。
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            path = os.environ.get("COMFYUI_UPLOAD_INDEX_PATH") or os.path.join(os.path.dirname(__file__), "upload_index.sqlite3")
+            _index = UploadIndex(path)
+        return _index
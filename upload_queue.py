@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import uuid
+import queue
+import shutil
+import logging
+import threading
+from typing import Callable, Optional
+from .upload_index import get_upload_index
+
+logger = logging.getLogger("ComfyUI-UploadQueue")
+
+
+def _env_int(name: str, default: int) -> int:
+    """读取整数环境变量，非法值回退默认值"""
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _open_private(path: str, mode: str, **kwargs):
+    """以 0600 权限创建并打开文件（已存在时截断）"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    return os.fdopen(fd, mode, **kwargs)
+
+
+class UploadQueue:
+    """
+    后台异步上传队列
+
+    - 节点将待上传内容写入磁盘暂存目录（spool）后立即返回预先确定的 URL
+    - 工作线程池从暂存目录取任务上传，失败按指数退避重试
+    - 任务元数据持久化为 JSON，进程重启后未完成的任务会继续上传
+
+    uploader_factory(spec) 根据任务中的上传配置（云类型、空间、凭证指纹等）返回上传器实例，
+    spec 由调用方构造，不应包含密钥。暂存目录与其中文件仅属主可读写（0700 / 0600）。
+    """
+
+    # 内存中保留的已完成任务数，供状态接口查询
+    DONE_RETENTION = 1000
+
+    def __init__(self, spool_dir: str, uploader_factory: Callable, workers: int = 2, max_attempts: int = 5):
+        self.spool_dir = spool_dir
+        self.uploader_factory = uploader_factory
+        self.max_attempts = max_attempts
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        os.makedirs(spool_dir, mode=0o700, exist_ok=True)
+        os.chmod(spool_dir, 0o700)
+        self._restore()
+        for i in range(max(1, workers)):
+            threading.Thread(target=self._worker, name=f"upload-worker-{i}", daemon=True).start()
+
+    # ----------------------------
+    # 入队
+    # ----------------------------
+    def enqueue_bytes(self, spec: dict, key: str, data: bytes, index: dict = None) -> str:
+        """
+        暂存二进制内容并入队，返回任务 id。
+        index 为 {"namespace", "etag"} 时，上传成功后写入上传索引，供内容寻址去重命中。
+        """
+        job_id = uuid.uuid4().hex
+        payload = os.path.join(self.spool_dir, f"{job_id}.bin")
+        with _open_private(payload, "wb") as f:
+            f.write(data)
+        return self._add_job(job_id, spec, key, payload, owned=True, index=index)
+
+    def enqueue_file(self, spec: dict, key: str, path: str, move: bool = False, index: dict = None) -> str:
+        """
+        文件入队：move=True 时将文件移入暂存目录（如合成的临时视频），
+        否则直接引用原文件路径，上传完成后不删除原文件。index 同 enqueue_bytes。
+        """
+        job_id = uuid.uuid4().hex
+        if move:
+            payload = os.path.join(self.spool_dir, f"{job_id}{os.path.splitext(path)[1] or '.bin'}")
+            shutil.move(path, payload)
+            os.chmod(payload, 0o600)
+        else:
+            payload = os.path.abspath(path)
+        return self._add_job(job_id, spec, key, payload, owned=move, index=index)
+
+    def _add_job(self, job_id: str, spec: dict, key: str, payload: str, owned: bool, index: dict = None) -> str:
+        now = time.time()
+        job = {
+            "id": job_id,
+            "key": key,
+            "spec": spec,
+            "payload": payload,
+            "owned": owned,
+            "index": index,
+            "size": os.path.getsize(payload),
+            "status": "pending",
+            "attempts": 0,
+            "error": "",
+            "url": "",
+            "created": now,
+            "updated": now,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._save(job)
+        self._queue.put(job_id)
+        return job_id
+
+    # ----------------------------
+    # 持久化
+    # ----------------------------
+    def _meta_path(self, job_id: str) -> str:
+        return os.path.join(self.spool_dir, f"{job_id}.json")
+
+    def _save(self, job: dict):
+        tmp = self._meta_path(job["id"]) + ".tmp"
+        with _open_private(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp, self._meta_path(job["id"]))
+
+    def _restore(self):
+        """进程启动时恢复未完成的任务"""
+        for name in os.listdir(self.spool_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.spool_dir, name), "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"上传任务记录损坏，已跳过: {name}，{str(e)}")
+                continue
+            if job.get("status") == "done":
+                continue
+            if not os.path.exists(job["payload"]):
+                job["status"] = "failed"
+                job["error"] = "待上传文件不存在"
+                self._jobs[job["id"]] = job
+                continue
+            job["status"] = "pending"
+            self._jobs[job["id"]] = job
+            self._queue.put(job["id"])
+        if self._jobs:
+            logger.info(f"恢复 {len(self._jobs)} 个未完成的上传任务")
+
+    # ----------------------------
+    # 上传
+    # ----------------------------
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] not in ("pending", "retrying"):
+                    continue
+                job["status"] = "uploading"
+                job["attempts"] += 1
+                job["updated"] = time.time()
+                self._save(job)
+            try:
+                uploader = self.uploader_factory(job["spec"])
+                url = uploader.upload_file(job["payload"], job["key"])
+            except Exception as e:
+                self._on_failure(job, e)
+            else:
+                self._on_success(job, url)
+
+    def _on_success(self, job: dict, url: str):
+        with self._lock:
+            job["status"] = "done"
+            job["url"] = url
+            job["error"] = ""
+            job["updated"] = time.time()
+            if job["owned"] and os.path.exists(job["payload"]):
+                os.remove(job["payload"])
+            meta = self._meta_path(job["id"])
+            if os.path.exists(meta):
+                os.remove(meta)
+            done = [j for j in self._jobs.values() if j["status"] == "done"]
+            for old in sorted(done, key=lambda j: j["updated"])[:-self.DONE_RETENTION]:
+                del self._jobs[old["id"]]
+        if job.get("index"):
+            try:
+                get_upload_index().put(job["index"]["namespace"], job["key"], job["index"]["etag"], url, job["size"])
+            except Exception as e:
+                logger.warning(f"上传索引写入失败: {job['key']}，{str(e)}")
+        logger.info(f"后台上传完成: {url}")
+
+    def _on_failure(self, job: dict, error: Exception):
+        with self._lock:
+            job["error"] = str(error)
+            job["updated"] = time.time()
+            if job["attempts"] >= self.max_attempts:
+                job["status"] = "failed"
+                self._save(job)
+                logger.error(f"后台上传失败（已重试 {job['attempts']} 次）: {job['key']}，{str(error)}")
+                return
+            job["status"] = "retrying"
+            self._save(job)
+        delay = min(60, 2 ** job["attempts"])
+        logger.warning(f"后台上传失败，{delay}s 后重试: {job['key']}，{str(error)}")
+        timer = threading.Timer(delay, self._queue.put, args=(job["id"],))
+        timer.daemon = True
+        timer.start()
+
+    # ----------------------------
+    # 状态
+    # ----------------------------
+    def status(self, job_id: Optional[str] = None) -> dict:
+        """返回队列整体进度，或单个任务状态（不含密钥）"""
+        with self._lock:
+            jobs = [
+                {k: v for k, v in job.items() if k != "spec"}
+                for job in self._jobs.values()
+                if job_id is None or job["id"] == job_id
+            ]
+        summary = {}
+        for job in jobs:
+            summary[job["status"]] = summary.get(job["status"], 0) + 1
+        return {
+            "summary": summary,
+            "pending_bytes": sum(j["size"] for j in jobs if j["status"] != "done"),
+            "jobs": sorted(jobs, key=lambda j: j["created"]),
+        }
+
+
+_upload_queue = None
+_upload_queue_lock = threading.Lock()
+
+
+def get_spool_dir() -> str:
+    """上传暂存目录，可通过环境变量 COMFYUI_UPLOAD_SPOOL 指定"""
+    return os.environ.get("COMFYUI_UPLOAD_SPOOL") or os.path.join(os.path.dirname(__file__), "upload_spool")
+
+
+def get_upload_queue(uploader_factory: Callable) -> UploadQueue:
+    """
+    获取进程内共享的上传队列，首次调用时启动工作线程。
+    可通过环境变量配置：COMFYUI_UPLOAD_WORKERS、COMFYUI_UPLOAD_MAX_ATTEMPTS
+    """
+    global _upload_queue
+    with _upload_queue_lock:
+        if _upload_queue is None:
+            _upload_queue = UploadQueue(
+                get_spool_dir(),
+                uploader_factory,
+                workers=_env_int("COMFYUI_UPLOAD_WORKERS", 2),
+                max_attempts=_env_int("COMFYUI_UPLOAD_MAX_ATTEMPTS", 5),
+            )
+        return _upload_queue
+
+
+def resume_pending(uploader_factory: Callable):
+    """暂存目录中有上次未完成的任务时，启动时立即恢复上传"""
+    spool_dir = get_spool_dir()
+    if os.path.isdir(spool_dir) and any(name.endswith(".json") for name in os.listdir(spool_dir)):
+        get_upload_queue(uploader_factory)
+
+
+def register_routes():
+    """
+    注册上传进度接口：
+    GET /comfyui_llm/uploads/status[?id=任务id]
+    """
+    try:
+        from server import PromptServer
+        from aiohttp import web
+    except ImportError:
+        return
+
+    @PromptServer.instance.routes.get("/comfyui_llm/uploads/status")
+    async def upload_status(request):
+        if _upload_queue is None:
+            return web.json_response({"summary": {}, "pending_bytes": 0, "jobs": []})
+        return web.json_response(_upload_queue.status(request.query.get("id")))